@@ -21,6 +21,7 @@ pip3 install --upgrade \
     mysql-connector-python \
     jetson-stats \
     psutil \
+    numpy \
     configparser \
     subprocess32
 
@@ -0,0 +1,41 @@
+TRACKED_METRICS = ('cpu1', 'cpu2', 'cpu3', 'cpu4', 'cpu5', 'cpu6', 'gpu', 'emc', 'ram', 'power_tot')
+TEMP_PREFIX = 'temp_'
+
+
+class AdaptiveInterval:
+    # Halves the interval when tracked metrics move quickly or a temperature is
+    # within temp_margin of temp_limit, and stretches it back out by `relax`
+    # while the device stays quiet. Always clamped to [min_interval, max_interval].
+    def __init__(self, base_interval=5.0, min_interval=1.0, max_interval=30.0, temp_limit=85.0,
+                 temp_margin=10.0, change_threshold=0.1, relax=1.25):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.temp_limit = temp_limit
+        self.temp_margin = temp_margin
+        self.change_threshold = change_threshold
+        self.relax = relax
+        self.interval = min(max(base_interval, min_interval), max_interval)
+        self.prev = None
+
+    def activity(self, data):
+        current = {k: data[k] for k in TRACKED_METRICS if isinstance(data.get(k), (int, float))}
+        prev, self.prev = self.prev, current
+        if not prev:
+            return 0.0
+        change = 0.0
+        for key, value in current.items():
+            if key in prev:
+                scale = max(abs(prev[key]), abs(value), 1.0 if key != 'ram' else 0.01)
+                change = max(change, abs(value - prev[key]) / scale)
+        return change
+
+    def headroom(self, data):
+        temps = [v for k, v in data.items() if k.startswith(TEMP_PREFIX) and isinstance(v, (int, float))]
+        return self.temp_limit - max(temps) if temps else self.temp_limit
+
+    def next_interval(self, data):
+        if self.activity(data) > self.change_threshold or self.headroom(data) < self.temp_margin:
+            self.interval = max(self.min_interval, self.interval / 2)
+        else:
+            self.interval = min(self.max_interval, self.interval * self.relax)
+        return self.interval
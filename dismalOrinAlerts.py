@@ -0,0 +1,148 @@
+import time
+import math
+import subprocess
+from configparser import ConfigParser
+from mysql.connector import Error
+
+ALERT_TABLE = 'alerts'
+RULE_PREFIX = 'alert:'
+
+
+def create_alert_table(cursor):
+    try:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS `{ALERT_TABLE}` (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                time DATETIME,
+                hostname VARCHAR(255),
+                rule VARCHAR(100),
+                metric VARCHAR(100),
+                state VARCHAR(10),
+                value FLOAT,
+                message VARCHAR(255),
+                INDEX idx_host_time (hostname, time)
+            );
+        """)
+    except Error as e:
+        print(f"Error creating table `{ALERT_TABLE}`: {e}")
+
+
+class AlertRule:
+    # kind is one of threshold, rate (units per second) or zscore (EWMA based);
+    # every rule keeps a fixed handful of numbers as state
+    def __init__(self, name, metric, kind='threshold', limit=0.0, direction='above',
+                 sustain=1, alpha=0.1, warmup=20):
+        self.name = name
+        self.metric = metric
+        self.kind = kind
+        self.limit = limit
+        self.direction = direction
+        self.sustain = sustain
+        self.alpha = alpha
+        self.warmup = warmup
+        self.count = 0
+        self.active = False
+        self.prev_value = None
+        self.prev_time = None
+        self.mean = None
+        self.var = 0.0
+        self.samples = 0
+
+    def exceeds(self, value):
+        return value > self.limit if self.direction == 'above' else value < self.limit
+
+    def condition(self, value, now):
+        if self.kind == 'threshold':
+            return self.exceeds(value), value
+        if self.kind == 'rate':
+            prev_value, prev_time = self.prev_value, self.prev_time
+            self.prev_value, self.prev_time = value, now
+            if prev_time is None or now <= prev_time:
+                return False, 0.0
+            rate = (value - prev_value) / (now - prev_time)
+            return self.exceeds(rate), rate
+        if self.kind == 'zscore':
+            self.samples += 1
+            if self.mean is None:
+                self.mean = value
+                return False, 0.0
+            diff = value - self.mean
+            z = diff / math.sqrt(self.var) if self.var > 0 else 0.0
+            self.mean += self.alpha * diff
+            self.var = (1 - self.alpha) * (self.var + self.alpha * diff * diff)
+            return self.samples > self.warmup and abs(z) > self.limit, z
+        raise Exception(f'Unknown alert rule kind {self.kind}')
+
+    def update(self, value, now):
+        triggered, score = self.condition(value, now)
+        if triggered:
+            self.count += 1
+            if not self.active and self.count >= self.sustain:
+                self.active = True
+                return 'fired', score
+        else:
+            self.count = 0
+            if self.active:
+                self.active = False
+                return 'resolved', score
+        return None, score
+
+
+def load_alert_rules(filename='backendItems/config.ini'):
+    parser = ConfigParser(interpolation=None)
+    parser.read(filename)
+    rules = []
+    for section in parser.sections():
+        if not section.startswith(RULE_PREFIX):
+            continue
+        options = parser[section]
+        rules.append(AlertRule(
+            section[len(RULE_PREFIX):],
+            options.get('metric'),
+            kind=options.get('kind', 'threshold'),
+            limit=options.getfloat('limit', 0.0),
+            direction=options.get('direction', 'above'),
+            sustain=options.getint('sustain', 1),
+            alpha=options.getfloat('alpha', 0.1),
+            warmup=options.getint('warmup', 20),
+        ))
+    return rules
+
+
+class AlertEngine:
+    def __init__(self, rules, hook=None):
+        self.rules = rules
+        self.hook = hook
+
+    def evaluate(self, data, now=None):
+        now = time.monotonic() if now is None else now
+        events = []
+        for rule in self.rules:
+            value = data.get(rule.metric)
+            if not isinstance(value, (int, float)):
+                continue
+            state, score = rule.update(value, now)
+            if state:
+                message = f"{rule.kind} {rule.metric}={value:g} ({score:.3g} {rule.direction} {rule.limit:g})"
+                events.append((rule.name, rule.metric, state, value, message))
+        return events
+
+    def notify(self, events):
+        # runs without the database, so the local hook still fires during an outage
+        for rule, metric, state, value, message in events:
+            print(f"Alert {rule} {state}: {message}")
+            if self.hook:
+                try:
+                    subprocess.Popen([self.hook, state, rule, metric, str(value), message])
+                except OSError as e:
+                    print(f"Alert hook failed: {e}")
+
+    def record(self, cursor, timestamp, hostname, events):
+        if cursor is None or not events:
+            return
+        query = (f"INSERT INTO `{ALERT_TABLE}` (time, hostname, rule, metric, state, value, message) "
+                 f"VALUES (%s, %s, %s, %s, %s, %s, %s)")
+        try:
+            cursor.executemany(query, [(timestamp, hostname) + event for event in events])
+        except Error as e:
+            print(f"MySQL Error inserting into {ALERT_TABLE}: {e}")
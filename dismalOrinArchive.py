@@ -0,0 +1,187 @@
+import os
+import argparse
+from datetime import datetime, timedelta
+from decimal import Decimal
+import numpy as np
+import mysql.connector
+from mysql.connector import Error
+from dismalOrinGather import read_db_config, read_config, is_enabled
+from dismalOrinMetrics import COLUMN_TYPES
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # parquet output is optional, .npz needs only numpy
+    pyarrow = None
+
+WATERMARK_TABLE = 'archive_watermarks'
+NUMERIC_TYPES = ('INT', 'BIGINT', 'FLOAT', 'DOUBLE', 'DECIMAL')
+
+
+def create_watermark_table(cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS `{WATERMARK_TABLE}` (
+            table_name VARCHAR(255) PRIMARY KEY,
+            last_id BIGINT NOT NULL,
+            updated DATETIME
+        );
+    """)
+
+
+def get_watermark(cursor, table_name):
+    cursor.execute(f"SELECT last_id FROM `{WATERMARK_TABLE}` WHERE table_name = %s", (table_name,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def set_watermark(cursor, table_name, last_id):
+    cursor.execute(
+        f"INSERT INTO `{WATERMARK_TABLE}` (table_name, last_id, updated) VALUES (%s, %s, %s) "
+        f"ON DUPLICATE KEY UPDATE last_id = VALUES(last_id), updated = VALUES(updated)",
+        (table_name, last_id, datetime.utcnow()))
+
+
+def list_storage_tables(cursor):
+    cursor.execute("SHOW TABLES LIKE '%\\_storage'")
+    return [row[0] for row in cursor.fetchall()]
+
+
+def column_kind(name, values):
+    # the schema decides, so a column that is all NULL in this part (energy_* or
+    # boot_id/seq on older rows) still gets its real dtype; only columns the
+    # schema does not know fall back to the first value, and all-NULL ones to NaN
+    sql_type = 'INT' if name == 'id' else COLUMN_TYPES.get(name, '').upper()
+    if sql_type.startswith('DATETIME'):
+        return 'time'
+    if sql_type.startswith(NUMERIC_TYPES):
+        return 'number'
+    if sql_type:
+        return 'text'
+    sample = next((v for v in values if v is not None), None)
+    if isinstance(sample, datetime):
+        return 'time'
+    if sample is None or (isinstance(sample, (int, float, Decimal)) and not isinstance(sample, bool)):
+        return 'number'
+    return 'text'
+
+
+def column_to_array(name, values):
+    kind = column_kind(name, values)
+    if kind == 'time':
+        return np.array([v if v is not None else 'NaT' for v in values], dtype='datetime64[s]')
+    if kind == 'number':
+        return np.array([float(v) if v is not None else np.nan for v in values], dtype=np.float64)
+    return np.array(['' if v is None else str(v) for v in values])
+
+
+def rows_to_columns(column_names, rows):
+    return {name: column_to_array(name, [row[i] for row in rows]) for i, name in enumerate(column_names)}
+
+
+def write_part(directory, host, day, columns, file_format):
+    day_dir = os.path.join(directory, host, day)
+    os.makedirs(day_dir, exist_ok=True)
+    ids = columns['id']
+    base = os.path.join(day_dir, f"{int(ids[0])}-{int(ids[-1])}")
+    if file_format == 'parquet':
+        table = pyarrow.table({name: pyarrow.array(values) for name, values in columns.items()})
+        path = base + '.parquet'
+        pyarrow.parquet.write_table(table, path + '.tmp', compression='zstd')
+    else:
+        path = base + '.npz'
+        with open(path + '.tmp', 'wb') as f:
+            np.savez_compressed(f, **columns)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def export_table(connection, table_name, cutoff, directory, file_format, chunk_size):
+    host = table_name[:-len('_storage')]
+    cursor = connection.cursor(buffered=True)
+    last_id = get_watermark(cursor, table_name)
+    start_id = last_id
+    exported = 0
+    stream = connection.cursor()  # unbuffered: rows are streamed from the server
+    while True:
+        stream.execute(f"SELECT * FROM `{table_name}` WHERE id > %s ORDER BY id LIMIT %s", (last_id, chunk_size))
+        column_names = stream.column_names
+        time_index = column_names.index('time')
+        rows = []
+        done = False
+        for row in stream:
+            if done:
+                continue  # drain the rest of the result set
+            if row[time_index] is None or row[time_index] >= cutoff:
+                done = True
+                continue
+            rows.append(row)
+        if rows:
+            days = {}
+            for row in rows:
+                days.setdefault(row[time_index].strftime('%Y-%m-%d'), []).append(row)
+            for day, day_rows in days.items():
+                write_part(directory, host, day, rows_to_columns(column_names, day_rows), file_format)
+            last_id = rows[-1][0]
+            exported += len(rows)
+            set_watermark(cursor, table_name, last_id)
+            connection.commit()
+        if done or len(rows) < chunk_size:
+            break
+    stream.close()
+    cursor.close()
+    print(f"Exported {exported} rows from `{table_name}` (id {start_id} -> {last_id})")
+    return start_id, last_id
+
+
+def delete_exported(connection, table_name, last_id, chunk_size):
+    cursor = connection.cursor()
+    deleted = 0
+    while True:
+        cursor.execute(f"DELETE FROM `{table_name}` WHERE id <= %s ORDER BY id LIMIT %s", (last_id, chunk_size))
+        connection.commit()
+        deleted += cursor.rowcount
+        if cursor.rowcount < chunk_size:
+            break
+    cursor.close()
+    print(f"Deleted {deleted} archived rows from `{table_name}`")
+
+
+def main():
+    archive_config = read_config('archive')
+    parser = argparse.ArgumentParser(description='Export old storage rows to compressed columnar files')
+    parser.add_argument('--directory', default=archive_config.get('directory', 'archive'))
+    parser.add_argument('--format', choices=['npz', 'parquet'], default=archive_config.get('format', 'npz'))
+    parser.add_argument('--older-than-days', type=int, default=int(archive_config.get('older_than_days', 30)))
+    parser.add_argument('--chunk-size', type=int, default=int(archive_config.get('chunk_size', 50000)))
+    parser.add_argument('--delete', action='store_true', default=is_enabled(archive_config, 'delete'))
+    parser.add_argument('--table', action='append', help='storage table to export (default: all)')
+    args = parser.parse_args()
+
+    if args.format == 'parquet' and pyarrow is None:
+        raise Exception('parquet format selected but pyarrow is not installed')
+
+    cutoff = datetime.utcnow() - timedelta(days=args.older_than_days)
+    try:
+        connection = mysql.connector.connect(**read_db_config())
+    except Error as e:
+        print(f"MySQL Error: {e}")
+        return
+
+    try:
+        cursor = connection.cursor()
+        create_watermark_table(cursor)
+        connection.commit()
+        tables = args.table or list_storage_tables(cursor)
+        cursor.close()
+        for table_name in tables:
+            start_id, last_id = export_table(connection, table_name, cutoff, args.directory, args.format, args.chunk_size)
+            if args.delete and last_id > 0:
+                delete_exported(connection, table_name, last_id, args.chunk_size)
+    except Error as e:
+        print(f"MySQL Error: {e}")
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+import zlib
+import struct
+import argparse
+from fnmatch import fnmatch
+from datetime import datetime, timedelta, timezone
+from configparser import ConfigParser
+import numpy as np
+import mysql.connector
+from mysql.connector import Error
+from dismalOrinMetrics import METRICS
+
+CHUNK_TABLE = 'metric_chunks'
+CHUNK_VERSION = 2
+HEADER = struct.Struct('<BHHq')  # version, samples, columns, first time (epoch ms)
+NUMERIC_TYPES = ('INT', 'BIGINT', 'FLOAT', 'DOUBLE')
+# float32 keeps ~7 significant digits, too few for cumulative counters such as
+# energy_*_mj or for BIGINT ids, so these columns are packed as float64
+WIDE_COLUMNS = {m.column for m in METRICS if m.sql_type.startswith(('BIGINT', 'DOUBLE'))}
+DTYPES = {b'f': '<f4', b'd': '<f8'}
+
+
+def create_chunk_table(cursor):
+    try:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS `{CHUNK_TABLE}` (
+                hostname VARCHAR(255) NOT NULL,
+                metric_group VARCHAR(32) NOT NULL,
+                chunk_start DATETIME(3) NOT NULL,
+                chunk_end DATETIME(3) NOT NULL,
+                samples SMALLINT UNSIGNED NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (hostname, metric_group, chunk_start)
+            );
+        """)
+    except Error as e:
+        print(f"Error creating table `{CHUNK_TABLE}`: {e}")
+
+
+def load_groups(filename='backendItems/config.ini', section='chunk_groups', metrics=METRICS):
+    # group name = comma separated column patterns, resolved against the numeric METRICS columns
+    parser = ConfigParser(interpolation=None)
+    parser.optionxform = str
+    parser.read(filename)
+    if not parser.has_section(section):
+        return {}
+    numeric = [m.column for m in metrics if m.sql_type.startswith(NUMERIC_TYPES)]
+    groups = {}
+    for name, value in parser.items(section):
+        patterns = [p.strip() for p in value.split(',') if p.strip()]
+        columns = [c for c in numeric if any(fnmatch(c, p) for p in patterns)]
+        if columns:
+            groups[name] = columns
+    return groups
+
+
+def encode_chunk(columns, times, values, wide=WIDE_COLUMNS):
+    # zlib(header | column names | one dtype code per column | uint32 ms offsets |
+    # each column's values as float32 ('f') or float64 ('d'))
+    times_ms = np.round(np.asarray(times) * 1000).astype(np.int64)
+    out = bytearray(HEADER.pack(CHUNK_VERSION, len(times_ms), len(columns), int(times_ms[0])))
+    names = ",".join(columns).encode()
+    out += struct.pack('<H', len(names)) + names
+    codes = [b'd' if c in wide else b'f' for c in columns]
+    out += b"".join(codes)
+    out += (times_ms - times_ms[0]).astype('<u4').tobytes()
+    matrix = np.asarray(values, dtype=np.float64).reshape(len(times_ms), len(columns))
+    for i, code in enumerate(codes):
+        out += matrix[:, i].astype(DTYPES[code]).tobytes()
+    return zlib.compress(bytes(out))
+
+
+def decode_chunk(blob):
+    data = zlib.decompress(blob)
+    version, samples, width, first_ms = HEADER.unpack_from(data)
+    if version not in (1, CHUNK_VERSION):
+        raise ValueError(f"Unknown chunk version {version}")
+    pos = HEADER.size
+    (length,) = struct.unpack_from('<H', data, pos)
+    pos += 2
+    columns = data[pos:pos + length].decode().split(',')
+    pos += length
+    codes = [b'f'] * width  # version 1 chunks are all float32
+    if version >= 2:
+        codes = [data[pos + i:pos + i + 1] for i in range(width)]
+        pos += width
+    offsets = np.frombuffer(data, dtype='<u4', count=samples, offset=pos)
+    pos += 4 * samples
+    values = {}
+    for name, code in zip(columns, codes):
+        dtype = np.dtype(DTYPES[code])
+        values[name] = np.frombuffer(data, dtype=dtype, count=samples, offset=pos)
+        pos += dtype.itemsize * samples
+    times = (first_ms + offsets.astype(np.int64)).astype('datetime64[ms]')
+    return times, values
+
+
+class ChunkWriter:
+    # Buffers `chunk_size` samples per metric group and returns one row per full
+    # chunk; a chunk is also closed once it spans max_span seconds, which bounds
+    # how far back a range read has to look for overlapping chunks.
+    def __init__(self, groups, chunk_size=60, max_span=3600):
+        self.groups = groups
+        self.chunk_size = chunk_size
+        self.max_span = max_span
+        self.times = []
+        self.rows = []
+
+    def add(self, data, t):
+        out = []
+        if self.times and t - self.times[0] >= self.max_span:
+            out = self.flush()
+        self.times.append(t)
+        self.rows.append(data)
+        if len(self.times) >= self.chunk_size:
+            out += self.flush()
+        return out
+
+    def flush(self):
+        if not self.times:
+            return []
+        start = datetime.fromtimestamp(self.times[0], timezone.utc).replace(tzinfo=None)
+        end = datetime.fromtimestamp(self.times[-1], timezone.utc).replace(tzinfo=None)
+        out = []
+        for name, columns in self.groups.items():
+            values = [[as_float(row.get(c)) for c in columns] for row in self.rows]
+            out.append((name, start, end, len(self.times), encode_chunk(columns, self.times, values)))
+        self.times = []
+        self.rows = []
+        return out
+
+
+def as_float(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return np.nan
+
+
+def insert_chunks(cursor, hostname, rows):
+    if not rows:
+        return
+    query = (f"INSERT IGNORE INTO `{CHUNK_TABLE}` (hostname, metric_group, chunk_start, chunk_end, samples, data) "
+             f"VALUES (%s, %s, %s, %s, %s, %s)")
+    try:
+        cursor.executemany(query, [(hostname,) + row for row in rows])
+    except Error as e:
+        print(f"MySQL Error inserting into {CHUNK_TABLE}: {e}")
+
+
+def load_chunks(cursor, hostname, group, start, end, max_span=3600):
+    # decodes only the chunks overlapping [start, end); the primary key range on
+    # chunk_start is bounded below by max_span so older chunks are never read
+    cursor.execute(f"SELECT data FROM `{CHUNK_TABLE}` WHERE hostname = %s AND metric_group = %s "
+                   f"AND chunk_start >= %s AND chunk_start < %s AND chunk_end >= %s ORDER BY chunk_start",
+                   (hostname, group, start - timedelta(seconds=max_span), end, start))
+    times, columns = [], {}
+    for (blob,) in cursor.fetchall():
+        chunk_times, chunk_values = decode_chunk(bytes(blob))
+        keep = (chunk_times >= np.datetime64(start, 'ms')) & (chunk_times < np.datetime64(end, 'ms'))
+        times.append(chunk_times[keep])
+        for name, values in chunk_values.items():
+            columns.setdefault(name, []).append(values[keep])
+    if not times:
+        return np.array([], dtype='datetime64[ms]'), {}
+    return np.concatenate(times), {name: np.concatenate(parts) for name, parts in columns.items()}
+
+
+def table_sizes(cursor, tables):
+    cursor.execute(f"SELECT table_name, table_rows, data_length + index_length FROM information_schema.tables "
+                   f"WHERE table_schema = DATABASE() AND table_name IN ({', '.join(['%s'] * len(tables))})", tables)
+    return cursor.fetchall()
+
+
+def main():
+    from dismalOrinGather import read_db_config, read_config
+    from dismalOrinQuery import parse_duration
+    chunk_config = read_config('chunks')
+    parser = argparse.ArgumentParser(description='Read chunked series back as arrays, or compare table sizes')
+    parser.add_argument('host')
+    parser.add_argument('--group', help='metric group to print as CSV (default: print table sizes)')
+    parser.add_argument('--last', type=parse_duration, default=parse_duration('1h'), help='e.g. 1h, 7d')
+    parser.add_argument('--end', type=datetime.fromisoformat, help='UTC end of the range (default: now)')
+    args = parser.parse_args()
+
+    try:
+        connection = mysql.connector.connect(**read_db_config())
+        cursor = connection.cursor()
+        if args.group:
+            end = args.end or datetime.utcnow()
+            times, columns = load_chunks(cursor, args.host, args.group, end - args.last, end,
+                                         float(chunk_config.get('max_span', 3600)))
+            names = list(columns)
+            print(",".join(['time'] + names))
+            for i, t in enumerate(times):
+                print(",".join([str(t)] + [f"{columns[n][i]:g}" for n in names]))
+        else:
+            cursor.execute(f"SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM `{CHUNK_TABLE}` WHERE hostname = %s",
+                           (args.host,))
+            chunks, blob_bytes = cursor.fetchone()
+            print(f"{args.host}: {chunks} chunks, {blob_bytes} bytes of packed data")
+            for table_name, rows, size in table_sizes(cursor, [f"{args.host}_storage", CHUNK_TABLE]):
+                print(f"{table_name}: ~{rows} rows, {size} bytes on disk")
+        connection.close()
+    except Error as e:
+        print(f"MySQL Error: {e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+import bisect
+from fnmatch import fnmatch
+from datetime import datetime, timezone
+from configparser import ConfigParser
+from mysql.connector import Error
+
+COMPRESSED_TABLE = 'compressed_samples'
+
+
+def create_compressed_table(cursor):
+    try:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS `{COMPRESSED_TABLE}` (
+                hostname VARCHAR(255),
+                metric VARCHAR(64),
+                time DATETIME(3),
+                value DOUBLE,
+                PRIMARY KEY (hostname, metric, time)
+            );
+        """)
+    except Error as e:
+        print(f"Error creating table `{COMPRESSED_TABLE}`: {e}")
+
+
+class DeadbandCompressor:
+    # Emits a point when it moves more than `tolerance` from the last emitted one.
+    # Step (sample-and-hold) reconstruction stays within `tolerance`.
+    def __init__(self, tolerance, max_gap=None):
+        self.tolerance = tolerance
+        self.max_gap = max_gap
+        self.emitted = None
+        self.last = None
+
+    def add(self, t, v):
+        self.last = (t, v)
+        if (self.emitted is None or abs(v - self.emitted[1]) > self.tolerance
+                or (self.max_gap and t - self.emitted[0] >= self.max_gap)):
+            self.emitted = (t, v)
+            return [(t, v)]
+        return []
+
+    def flush(self):
+        if self.last and self.last != self.emitted:
+            self.emitted = self.last
+            return [self.last]
+        return []
+
+
+class SwingingDoorCompressor:
+    # Keeps the range of slopes from the last emitted point (the anchor) that pass
+    # within `tolerance` of every point since. A point is only dropped if the line
+    # from the anchor to its successor stays inside that range, so linear
+    # interpolation between emitted points stays within `tolerance`.
+    def __init__(self, tolerance, max_gap=None):
+        self.tolerance = tolerance
+        self.max_gap = max_gap
+        self.anchor = None
+        self.last = None
+        self.low = float('-inf')
+        self.high = float('inf')
+
+    def restart(self, point):
+        self.anchor = point
+        self.low = float('-inf')
+        self.high = float('inf')
+
+    def add(self, t, v):
+        if self.anchor is None:
+            self.restart((t, v))
+            self.last = (t, v)
+            return [(t, v)]
+        if t <= self.anchor[0]:
+            return []
+        out = []
+        slope = (v - self.anchor[1]) / (t - self.anchor[0])
+        if (not self.low <= slope <= self.high
+                or (self.max_gap and t - self.anchor[0] > self.max_gap)) and self.last != self.anchor:
+            out.append(self.last)
+            self.restart(self.last)
+        dt = t - self.anchor[0]
+        self.low = max(self.low, (v - self.tolerance - self.anchor[1]) / dt)
+        self.high = min(self.high, (v + self.tolerance - self.anchor[1]) / dt)
+        self.last = (t, v)
+        return out
+
+    def flush(self):
+        if self.last and self.last != self.anchor:
+            self.restart(self.last)
+            return [self.last]
+        return []
+
+
+ALGORITHMS = {'deadband': DeadbandCompressor, 'swinging_door': SwingingDoorCompressor}
+
+
+def reconstruct(points, t, algorithm='swinging_door'):
+    times = [p[0] for p in points]
+    i = bisect.bisect_right(times, t) - 1
+    if i < 0:
+        return None
+    if algorithm == 'deadband' or i == len(points) - 1:
+        return points[i][1]
+    (t0, v0), (t1, v1) = points[i], points[i + 1]
+    return v0 + (v1 - v0) * (t - t0) / (t1 - t0)
+
+
+def load_tolerances(filename='backendItems/config.ini', section='compression_tolerances'):
+    parser = ConfigParser(interpolation=None)
+    parser.optionxform = str  # metric names are case sensitive
+    parser.read(filename)
+    if not parser.has_section(section):
+        return []
+    return [(pattern, float(value)) for pattern, value in parser.items(section)]
+
+
+class SeriesCompressor:
+    def __init__(self, tolerances, algorithm='swinging_door', max_gap=None):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown compression algorithm {algorithm!r}, expected one of {', '.join(ALGORITHMS)}")
+        self.tolerances = tolerances
+        self.factory = ALGORITHMS[algorithm]
+        self.max_gap = max_gap
+        self.compressors = {}
+
+    def tolerance_for(self, metric):
+        for pattern, tolerance in self.tolerances:
+            if fnmatch(metric, pattern):
+                return tolerance
+        return None
+
+    def add(self, data, t):
+        rows = []
+        for metric, value in data.items():
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            compressor = self.compressors.get(metric)
+            if compressor is None:
+                if metric in self.compressors:
+                    continue
+                tolerance = self.tolerance_for(metric)
+                compressor = self.factory(tolerance, self.max_gap) if tolerance is not None else None
+                self.compressors[metric] = compressor
+                if compressor is None:
+                    continue
+            rows.extend((metric, pt, pv) for pt, pv in compressor.add(t, float(value)))
+        return rows
+
+    def flush(self):
+        rows = []
+        for metric, compressor in self.compressors.items():
+            if compressor:
+                rows.extend((metric, pt, pv) for pt, pv in compressor.flush())
+        return rows
+
+
+def insert_compressed_samples(cursor, hostname, rows):
+    if not rows:
+        return
+    query = (f"INSERT IGNORE INTO `{COMPRESSED_TABLE}` (hostname, metric, time, value) "
+             f"VALUES (%s, %s, %s, %s)")
+    values = [(hostname, metric, datetime.fromtimestamp(t, timezone.utc).replace(tzinfo=None), v)
+              for metric, t, v in rows]
+    try:
+        cursor.executemany(query, values)
+    except Error as e:
+        print(f"MySQL Error inserting into {COMPRESSED_TABLE}: {e}")
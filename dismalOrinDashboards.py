@@ -0,0 +1,94 @@
+import re
+import glob
+import json
+from datetime import datetime, timezone
+from dismalOrinMigrate import current_column_name
+from dismalOrinQuery import parse_duration
+
+DASHBOARD_GLOB = 'dashboardItems/*.json'
+REFRESH_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}
+TABLE_PATTERN = re.compile(r'\b(FROM|JOIN)\s+(`?[\w$]+`?\.)?`?([\w$]+)`?', re.IGNORECASE)
+QUOTED_PATTERN = re.compile(r'`([^`]+)`')
+MACRO_PATTERN = re.compile(r'\$__(timeFilter|timeFrom|timeTo|unixEpochFilter|unixEpochFrom|unixEpochTo|'
+                           r'timeGroupAlias|timeGroup|unixEpochGroupAlias|unixEpochGroup)\(([^)]*)\)')
+
+
+def parse_refresh(value, default=5.0):
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*(ms|s|m|h|d)\s*', value or '')
+    if not match:
+        return default
+    return float(match.group(1)) * REFRESH_UNITS[match.group(2)]
+
+
+def walk_panels(panels):
+    for panel in panels:
+        yield panel
+        yield from walk_panels(panel.get('panels', []))
+
+
+def load_panel_queries(pattern=DASHBOARD_GLOB):
+    # (file, dashboard title, panel title, rawSql, refresh seconds) for every SQL target
+    queries = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path) as f:
+            dashboard = json.load(f)
+        refresh = parse_refresh(dashboard.get('refresh'))
+        for panel in walk_panels(dashboard.get('panels', [])):
+            for target in panel.get('targets', []):
+                sql = (target.get('rawSql') or '').strip()
+                if sql:
+                    queries.append((path, dashboard.get('title', ''), panel.get('title', ''), sql, refresh))
+    return queries
+
+
+def retarget_query(sql, table_name, database=None):
+    # point a shipped panel query at another host table and translate the V3/V4
+    # column names it was written against (`Temp CPU` -> temp_cpu)
+    sql = QUOTED_PATTERN.sub(lambda m: f"`{current_column_name(m.group(1))}`", sql)
+    qualified = f"`{database}`.`{table_name}`" if database else f"`{table_name}`"
+    return TABLE_PATTERN.sub(lambda m: f"{m.group(1)} {qualified}", sql)
+
+
+def parse_grafana_time(text, now):
+    # 'now', 'now-6h', or an ISO timestamp, all UTC
+    text = (text or 'now').strip()
+    if text.startswith('now'):
+        offset = text[3:].replace('/d', '')
+        return now - parse_duration(offset[1:]) if offset.startswith('-') else now
+    return datetime.fromisoformat(text)
+
+
+def macro_arguments(text):
+    return [a.strip() for a in text.split(',')] if text.strip() else []
+
+
+def expand_macros(sql, start, end, interval, variables=None):
+    # the MySQL data source's macros, expanded the way Grafana sends them to the server
+    quote = lambda when: f"'{when:%Y-%m-%d %H:%M:%S}'"
+    epoch = lambda when: str(int(when.replace(tzinfo=timezone.utc).timestamp()))
+
+    def group(args, alias):
+        # $__timeGroup(column, '5m'[, fill]): the interval may be quoted; the fill
+        # mode only changes how Grafana draws missing buckets, not the SQL
+        step_text = args[1].strip('\'"') if len(args) > 1 else '$__interval'
+        step = interval if step_text == '$__interval' else parse_duration(step_text).total_seconds()
+        text = f"UNIX_TIMESTAMP({args[0]}) DIV {int(step)} * {int(step)}"
+        return f'{text} AS "time"' if alias else text
+
+    macros = {
+        'timeFilter': lambda a: f"{a[0]} BETWEEN {quote(start)} AND {quote(end)}",
+        'timeFrom': lambda a: quote(start),
+        'timeTo': lambda a: quote(end),
+        'unixEpochFilter': lambda a: f"{a[0]} >= {epoch(start)} AND {a[0]} <= {epoch(end)}",
+        'unixEpochFrom': lambda a: epoch(start),
+        'unixEpochTo': lambda a: epoch(end),
+        'timeGroup': lambda a: group(a, False),
+        'timeGroupAlias': lambda a: group(a, True),
+        'unixEpochGroup': lambda a: f"floor({a[0]}/{int(interval)})*{int(interval)}",
+        'unixEpochGroupAlias': lambda a: f'floor({a[0]}/{int(interval)})*{int(interval)} AS "time"',
+    }
+    sql = MACRO_PATTERN.sub(lambda m: macros[m.group(1)](macro_arguments(m.group(2))), sql)
+    sql = sql.replace('$__interval_ms', str(int(interval * 1000))).replace('$__interval', f"{int(interval)}s")
+    for name, value in (variables or {}).items():
+        sql = sql.replace(f"${{{name}}}", value).replace(f"${name}", value)
+    return sql
@@ -0,0 +1,151 @@
+import uuid
+from collections import deque
+from mysql.connector import Error
+
+LEDGER_TABLE = 'delivery_ledger'
+BOOT_ID_PATH = '/proc/sys/kernel/random/boot_id'
+# lock wait timeout, deadlock, can't connect, server gone away, lost connection, not connected
+TRANSIENT_ERRORS = (1205, 1213, 2003, 2006, 2013, 2055)
+COUNTERS = ('produced', 'delivered', 'duplicates', 'dropped', 'rejected')
+
+
+def is_transient(error):
+    return getattr(error, 'errno', None) in TRANSIENT_ERRORS
+
+
+def read_boot_id(path=BOOT_ID_PATH):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return str(uuid.uuid4())
+
+
+def create_ledger_table(cursor):
+    try:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS `{LEDGER_TABLE}` (
+                hostname VARCHAR(255) NOT NULL,
+                boot_id CHAR(36) NOT NULL,
+                hour DATETIME NOT NULL,
+                produced INT NOT NULL DEFAULT 0,
+                delivered INT NOT NULL DEFAULT 0,
+                duplicates INT NOT NULL DEFAULT 0,
+                dropped INT NOT NULL DEFAULT 0,
+                rejected INT NOT NULL DEFAULT 0,
+                first_seq BIGINT,
+                last_seq BIGINT,
+                PRIMARY KEY (hostname, boot_id, hour)
+            );
+        """)
+        cursor.execute(f"SHOW COLUMNS FROM `{LEDGER_TABLE}` LIKE 'rejected'")
+        if not cursor.fetchall():
+            cursor.execute(f"ALTER TABLE `{LEDGER_TABLE}` ADD COLUMN rejected INT NOT NULL DEFAULT 0 AFTER dropped")
+    except Error as e:
+        print(f"Error creating table `{LEDGER_TABLE}`: {e}")
+
+
+def add_unique_key(cursor, table_name, key_name, columns):
+    cursor.execute(f"SHOW INDEX FROM `{table_name}` WHERE Key_name = %s", (key_name,))
+    if cursor.fetchall():
+        return
+    cursor.execute(f"ALTER TABLE `{table_name}` ADD UNIQUE KEY `{key_name}` ({', '.join(f'`{c}`' for c in columns)});")
+    print(f"Added unique key `{key_name}` to `{table_name}`.")
+
+
+class DeliveryLedger:
+    # Gives every sample a (boot_id, seq) identity and keeps rows until the
+    # transaction that inserted them has committed. The storage insert is
+    # idempotent on that key, so a retried row that did land counts as a
+    # duplicate, not a second copy. Rows the server rejects outright (anything but
+    # a lost connection, lock wait timeout or deadlock) are dropped as `rejected`
+    # so they cannot block the rows behind them. Per-hour produced/delivered/
+    # duplicate/dropped/rejected counters go to the ledger table.
+    def __init__(self, hostname, boot_id=None, max_pending=1000):
+        self.hostname = hostname
+        self.boot_id = boot_id or read_boot_id()
+        self.seq = 0
+        self.pending = deque()
+        self.max_pending = max_pending
+        self.in_transaction = []
+        self.counts = {}
+        self.flushed = None
+
+    def resume(self, cursor, table_name):
+        cursor.execute(f"SELECT COALESCE(MAX(seq), 0) FROM `{table_name}` WHERE boot_id = %s", (self.boot_id,))
+        self.seq = max(self.seq, int(cursor.fetchone()[0]))
+
+    def next_seq(self):
+        self.seq += 1
+        return self.seq
+
+    def count(self, hour, field=None, seq=None, n=1):
+        counts = self.counts.setdefault(hour, dict(dict.fromkeys(COUNTERS, 0), first_seq=None, last_seq=None))
+        if field:
+            counts[field] += n
+        if seq is not None:
+            counts['first_seq'] = seq if counts['first_seq'] is None else min(counts['first_seq'], seq)
+            counts['last_seq'] = seq if counts['last_seq'] is None else max(counts['last_seq'], seq)
+
+    def queue(self, row, timestamp, seq):
+        hour = timestamp[:13] + ':00:00'
+        self.count(hour, 'produced', seq)
+        self.pending.append((hour, row))
+        while len(self.pending) > self.max_pending:
+            self.count(self.pending.popleft()[0], 'dropped')
+
+    def deliver(self, cursor, query):
+        # transient errors propagate: the caller rolls back and the rows stay pending
+        while self.pending:
+            hour, row = self.pending[0]
+            try:
+                cursor.execute(query, row)
+            except Error as e:
+                if is_transient(e):
+                    raise
+                print(f"MySQL Error delivering sample, dropping it: {e}")
+                self.pending.popleft()
+                self.count(hour, 'rejected')
+                continue
+            self.pending.popleft()
+            self.in_transaction.append((hour, row, 'delivered' if cursor.rowcount == 1 else 'duplicates'))
+
+    def committed(self):
+        for hour, _, outcome in self.in_transaction:
+            self.count(hour, outcome)
+        self.in_transaction = []
+        self.flushed = None
+
+    def rolled_back(self):
+        self.pending.extendleft((hour, row) for hour, row, _ in reversed(self.in_transaction))
+        self.in_transaction = []
+        if self.flushed:
+            for hour, counts in self.flushed.items():
+                for field in COUNTERS:
+                    self.count(hour, field, n=counts[field])
+                for seq in (counts['first_seq'], counts['last_seq']):
+                    if seq is not None:
+                        self.count(hour, seq=seq)
+            self.flushed = None
+
+    def flush(self, cursor):
+        # the counts are only forgotten by committed(); rolled_back() restores them
+        if not self.counts:
+            return
+        query = (f"INSERT INTO `{LEDGER_TABLE}` (hostname, boot_id, hour, produced, delivered, duplicates, dropped, "
+                 f"rejected, first_seq, last_seq) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE "
+                 f"produced = produced + VALUES(produced), delivered = delivered + VALUES(delivered), "
+                 f"duplicates = duplicates + VALUES(duplicates), dropped = dropped + VALUES(dropped), "
+                 f"rejected = rejected + VALUES(rejected), "
+                 f"first_seq = LEAST(COALESCE(first_seq, VALUES(first_seq)), COALESCE(VALUES(first_seq), first_seq)), "
+                 f"last_seq = GREATEST(COALESCE(last_seq, VALUES(last_seq)), COALESCE(VALUES(last_seq), last_seq))")
+        rows = [(self.hostname, self.boot_id, hour, c['produced'], c['delivered'], c['duplicates'], c['dropped'],
+                 c['rejected'], c['first_seq'], c['last_seq']) for hour, c in self.counts.items()]
+        try:
+            cursor.executemany(query, rows)
+        except Error as e:
+            if is_transient(e):
+                raise
+            print(f"MySQL Error updating {LEDGER_TABLE}: {e}")
+            return
+        self.flushed, self.counts = self.counts, {}
@@ -0,0 +1,110 @@
+import time
+from collections.abc import Mapping
+from datetime import datetime, timezone
+from mysql.connector import Error
+
+DEVICE_TABLE = 'devices'
+METRIC_TABLE = 'metric_names'
+VALUE_TABLE = 'metric_values'
+MAX_NAME_LENGTH = 128
+
+
+def create_discovery_tables(cursor):
+    try:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS `{DEVICE_TABLE}` (
+                device_id SMALLINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+                hostname VARCHAR(255) NOT NULL UNIQUE
+            );
+        """)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS `{METRIC_TABLE}` (
+                metric_id SMALLINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+                name VARCHAR({MAX_NAME_LENGTH}) NOT NULL UNIQUE
+            );
+        """)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS `{VALUE_TABLE}` (
+                device_id SMALLINT UNSIGNED NOT NULL,
+                metric_id SMALLINT UNSIGNED NOT NULL,
+                ts DATETIME(3) NOT NULL,
+                value DOUBLE,
+                PRIMARY KEY (device_id, metric_id, ts)
+            );
+        """)
+    except Error as e:
+        print(f"Error creating discovery tables: {e}")
+
+
+def intern(cursor, table, key_column, id_column, name):
+    cursor.execute(f"INSERT IGNORE INTO `{table}` ({key_column}) VALUES (%s)", (name,))
+    cursor.execute(f"SELECT {id_column} FROM `{table}` WHERE {key_column} = %s", (name,))
+    return cursor.fetchone()[0]
+
+
+def flatten(prefix, value, out):
+    if isinstance(value, bool):
+        return
+    if isinstance(value, (int, float)):
+        out[prefix] = value
+    elif hasattr(value, 'total_seconds'):
+        out[prefix] = value.total_seconds()
+    elif isinstance(value, Mapping) or callable(getattr(value, 'items', None)):
+        # jtop's gpu, fan and memory attributes are mapping-like objects, not dicts
+        for key, item in value.items():
+            flatten(f"{prefix}.{key}" if prefix else str(key), item, out)
+    elif isinstance(value, (list, tuple)):
+        for index, item in enumerate(value):
+            flatten(f"{prefix}.{index}", item, out)
+
+
+class MetricDiscovery:
+    # Interns every numeric value the sampler exposes into a small metric id and
+    # batches (device_id, metric_id, ts, value) rows, so new rails, cores or fans
+    # on any Orin variant are stored without schema changes.
+    def __init__(self, cursor, hostname, sources=('stats',), batch_size=500, flush_interval=30, max_buffer=20000):
+        self.sources = sources
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.device_id = intern(cursor, DEVICE_TABLE, 'hostname', 'device_id', hostname)
+        cursor.execute(f"SELECT name, metric_id FROM `{METRIC_TABLE}`")
+        self.metric_ids = dict(cursor.fetchall())
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.dropped = 0
+
+    def values(self, sampler, stats):
+        values = {}
+        for source in self.sources:
+            obj = stats if source == 'stats' else getattr(sampler, source, None)
+            flatten('' if source == 'stats' else source, obj, values)
+        return values
+
+    def collect(self, cursor, sampler, stats, now=None):
+        ts = datetime.fromtimestamp(now or time.time(), timezone.utc).replace(tzinfo=None)
+        for name, value in self.values(sampler, stats).items():
+            name = name[:MAX_NAME_LENGTH]
+            metric_id = self.metric_ids.get(name)
+            if metric_id is None:
+                metric_id = intern(cursor, METRIC_TABLE, 'name', 'metric_id', name)
+                self.metric_ids[name] = metric_id
+                print(f"Discovered metric `{name}` as id {metric_id}")
+            self.buffer.append((self.device_id, metric_id, ts, float(value)))
+        if len(self.buffer) > self.max_buffer:
+            overflow = len(self.buffer) - self.max_buffer
+            del self.buffer[:overflow]
+            self.dropped += overflow
+        if len(self.buffer) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush(cursor)
+
+    def flush(self, cursor):
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return
+        query = f"INSERT IGNORE INTO `{VALUE_TABLE}` (device_id, metric_id, ts, value) VALUES (%s, %s, %s, %s)"
+        try:
+            cursor.executemany(query, self.buffer)
+            self.buffer = []
+        except Error as e:
+            print(f"MySQL Error inserting into {VALUE_TABLE}: {e}")
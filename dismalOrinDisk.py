@@ -0,0 +1,91 @@
+import os
+import time
+import psutil
+from mysql.connector import Error
+
+DISK_TABLE = 'disk_samples'
+SKIP_DEVICE_PREFIXES = ('loop', 'ram', 'zram')
+
+
+def create_disk_table(cursor):
+    try:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS `{DISK_TABLE}` (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                time DATETIME,
+                hostname VARCHAR(255),
+                device VARCHAR(64),
+                mountpoint VARCHAR(255),
+                total_gb FLOAT,
+                free_gb FLOAT,
+                read_bps FLOAT,
+                write_bps FLOAT,
+                read_iops FLOAT,
+                write_iops FLOAT,
+                busy_percent FLOAT,
+                INDEX idx_host_time (hostname, time)
+            );
+        """)
+    except Error as e:
+        print(f"Error creating table `{DISK_TABLE}`: {e}")
+
+
+class DiskCollector:
+    def __init__(self):
+        self.prev_counters = None
+        self.prev_wall = None
+
+    def mounts(self):
+        mounts = {}
+        for part in psutil.disk_partitions(all=False):
+            device = os.path.basename(part.device)
+            if device in mounts:
+                continue
+            try:
+                usage = psutil.disk_usage(part.mountpoint)
+            except OSError:
+                continue
+            mounts[device] = (part.mountpoint, usage.total / (1024 ** 3), usage.free / (1024 ** 3))
+        return mounts
+
+    def collect(self):
+        now = time.monotonic()
+        counters = psutil.disk_io_counters(perdisk=True) or {}
+        elapsed = now - self.prev_wall if self.prev_wall else None
+        prev_counters = self.prev_counters or {}
+        self.prev_counters = counters
+        self.prev_wall = now
+
+        mounts = self.mounts()
+        rows = []
+        for device, io in counters.items():
+            if device.startswith(SKIP_DEVICE_PREFIXES):
+                continue
+            mountpoint, total_gb, free_gb = mounts.pop(device, (None, None, None))
+            prev = prev_counters.get(device)
+            if prev is None or not elapsed:
+                rows.append((device, mountpoint, total_gb, free_gb, None, None, None, None, None))
+                continue
+            busy_ms = getattr(io, 'busy_time', 0) - getattr(prev, 'busy_time', 0)
+            rows.append((
+                device, mountpoint, total_gb, free_gb,
+                (io.read_bytes - prev.read_bytes) / elapsed,
+                (io.write_bytes - prev.write_bytes) / elapsed,
+                (io.read_count - prev.read_count) / elapsed,
+                (io.write_count - prev.write_count) / elapsed,
+                min(100.0, busy_ms / (elapsed * 10.0)),
+            ))
+        # mounted filesystems without their own I/O counters (e.g. overlay roots)
+        for device, (mountpoint, total_gb, free_gb) in mounts.items():
+            rows.append((device, mountpoint, total_gb, free_gb, None, None, None, None, None))
+        return rows
+
+
+def insert_disk_samples(cursor, timestamp, hostname, rows):
+    query = (f"INSERT INTO `{DISK_TABLE}` (time, hostname, device, mountpoint, total_gb, free_gb, "
+             f"read_bps, write_bps, read_iops, write_iops, busy_percent) "
+             f"VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)")
+    try:
+        cursor.executemany(query, [(timestamp, hostname) + row for row in rows])
+    except Error as e:
+        print(f"MySQL Error inserting into {DISK_TABLE}: {e}")
@@ -0,0 +1,76 @@
+import time
+import threading
+from dismalOrinSysfs import SysfsSampler
+
+# rail key from the sampler -> column prefix in the storage tables
+ENERGY_RAILS = {
+    'Power VDD_CPU_GPU_CV': 'energy_vdd_cpu_gpu_cv',
+    'Power VDD_SOC': 'energy_vdd_soc',
+    'Power TOT': 'energy_tot',
+}
+
+
+class EnergyIntegrator:
+    # Reads the INA3221 rails at rate_hz on a background thread (independent of
+    # the jtop update period) and integrates mW over monotonic time with the
+    # trapezoidal rule, so bursts between two stored samples are still counted.
+    def __init__(self, rate_hz=50.0, root='/'):
+        self.period = 1.0 / rate_hz
+        self.root = root
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.total_mj = {}
+        self.reported_mj = {}
+        self.samples = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='energy-integrator', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        sampler = SysfsSampler(self.root)
+        try:
+            if not sampler.rails:
+                print("No INA3221 power rails found, energy integration disabled")
+                return
+            prev_time = None
+            prev_power = None
+            next_time = time.monotonic()
+            while not self.stop_event.is_set():
+                now = time.monotonic()
+                power = sampler.read_power({})
+                if prev_time is not None:
+                    dt = now - prev_time
+                    with self.lock:
+                        for key, mw in power.items():
+                            if key in prev_power:
+                                self.total_mj[key] = self.total_mj.get(key, 0.0) + (prev_power[key] + mw) * 0.5 * dt
+                        self.samples += 1
+                prev_time, prev_power = now, power
+                next_time += self.period
+                delay = next_time - time.monotonic()
+                if delay < 0:
+                    next_time = time.monotonic()  # fell behind, don't try to catch up
+                    delay = 0
+                self.stop_event.wait(delay)
+        finally:
+            sampler.close()
+
+    def snapshot(self):
+        # cumulative mJ since the integrator started plus mJ since the previous snapshot
+        values = {}
+        with self.lock:
+            for key, column in ENERGY_RAILS.items():
+                total = self.total_mj.get(key)
+                if total is None:
+                    continue
+                values[f'{column}_mj'] = total
+                values[f'{column}_interval_mj'] = total - self.reported_mj.get(key, 0.0)
+                self.reported_mj[key] = total
+        return values
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=2)
@@ -1,6 +1,5 @@
 import mysql.connector
 from mysql.connector import Error
-from jtop import jtop
 import socket
 import time
 from configparser import ConfigParser
@@ -8,6 +7,33 @@ from datetime import datetime
 import psutil
 import subprocess
 import re
+import os
+import signal
+from collections import deque
+from dismalOrinMetrics import COLUMNS, COLUMN_TYPES, table_ddl, insert_query, make_row_builder
+from dismalOrinSysfs import SysfsSampler
+from dismalOrinProcesses import ProcessCollector, create_process_table, insert_process_samples
+from dismalOrinDisk import DiskCollector, create_disk_table, insert_disk_samples
+from dismalOrinNetwork import NetworkCollector, create_network_table, insert_network_samples
+from dismalOrinAlerts import AlertEngine, create_alert_table, load_alert_rules
+from dismalOrinAdaptive import AdaptiveInterval
+from dismalOrinMemory import MemoryGuard, create_stats_table
+from dismalOrinDiscovery import MetricDiscovery, create_discovery_tables
+from dismalOrinDelivery import DeliveryLedger, add_unique_key, create_ledger_table, is_transient
+from dismalOrinLiveness import create_heartbeat_table, update_heartbeat
+from dismalOrinStream import StreamPublisher
+from dismalOrinEnergy import EnergyIntegrator
+from dismalOrinCompression import SeriesCompressor, create_compressed_table, insert_compressed_samples, load_tolerances
+from dismalOrinSketch import SketchCollector, create_sketch_table, insert_sketches
+
+try:
+    from jtop import jtop
+except ImportError:  # only needed for the jtop backend
+    jtop = None
+try:
+    from dismalOrinChunks import ChunkWriter, create_chunk_table, insert_chunks, load_groups
+except ImportError:  # numpy is only needed when [chunks] is enabled
+    ChunkWriter = None
 
 def run_command(command):
     try:
@@ -55,7 +81,7 @@ def parse_jetson_release(output):
 
 def gather_device_info():
     jetson_release_output = run_command('jetson_release -s')
-    jetson_info = parse_jetson_release(jetson_release_output)
+    jetson_info = parse_jetson_release(jetson_release_output or '')
     return {
         'hostname': socket.gethostname(),
         'ip_address': socket.gethostbyname(socket.gethostname()),
@@ -73,8 +99,31 @@ def read_db_config(filename='backendItems/config.ini', section='database'):
         raise Exception(f'Section {section} not found in {filename}')
     return db
 
-def create_connection():
-    db_config = read_db_config()
+def read_config(section, filename='backendItems/config.ini'):
+    parser = ConfigParser(interpolation=None)
+    parser.read(filename)
+    if parser.has_section(section):
+        return dict(parser.items(section))
+    return {}
+
+def is_enabled(config, option='enabled'):
+    return config.get(option, 'false').strip().lower() in ('true', 'yes', 'on', '1')
+
+def open_sampler(backend):
+    if backend == 'sysfs':
+        return SysfsSampler()
+    if jtop is None:
+        raise Exception('jtop backend selected but jetson-stats is not installed')
+    return jtop()
+
+def read_config_sections(filename='backendItems/config.ini'):
+    parser = ConfigParser(interpolation=None)
+    parser.optionxform = str
+    parser.read(filename)
+    return {section: dict(parser.items(section)) for section in parser.sections()}
+
+def create_connection(db_config=None):
+    db_config = db_config or read_db_config()
     print(f"Connecting to MySQL host: {db_config['host']} database: {db_config['database']}")
     try:
         connection = mysql.connector.connect(**db_config)
@@ -89,29 +138,7 @@ def get_disk_space_gb():
     return psutil.disk_usage('/').free / (1024 ** 3)
 
 def create_table_if_missing(cursor, table_name):
-    columns = """
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        time DATETIME,
-        uptime VARCHAR(50),
-        cpu1 INT, cpu2 INT, cpu3 INT, cpu4 INT, cpu5 INT, cpu6 INT,
-        ram FLOAT, swap INT, emc INT, gpu INT,
-        ape VARCHAR(10), nvdec VARCHAR(10), nvjpg VARCHAR(10), nvjpg1 VARCHAR(10),
-        ofa VARCHAR(10), se VARCHAR(10), vic VARCHAR(10),
-        fan_pwmfan0 FLOAT,
-        temp_cpu FLOAT, temp_cv0 FLOAT, temp_cv1 FLOAT, temp_cv2 FLOAT, temp_gpu FLOAT,
-        temp_soc0 FLOAT, temp_soc1 FLOAT, temp_soc2 FLOAT, temp_tj FLOAT,
-        power_vdd_cpu_gpu_cv INT, power_vdd_soc INT, power_tot INT,
-        jetson_clocks VARCHAR(10),
-        nvp_model VARCHAR(50),
-        disk_available_gb FLOAT,
-        hostname VARCHAR(255),
-        ip_address VARCHAR(50),
-        model TEXT, jetpack TEXT, l4t TEXT, nv_power_mode TEXT,
-        serial_number TEXT, p_number TEXT, module TEXT,
-        distribution TEXT,
-        cuda TEXT, cudnn TEXT, tensorrt TEXT,
-        vpi TEXT, vulkan TEXT, opencv TEXT
-    """
+    columns = table_ddl()
     try:
         cursor.execute(f"CREATE TABLE IF NOT EXISTS `{table_name}` ({columns});")
         print(f"Table `{table_name}` created or already exists.")
@@ -126,14 +153,11 @@ def add_missing_columns(cursor, table_name, columns_dict):
             cursor.execute(f"ALTER TABLE `{table_name}` ADD COLUMN `{col_name}` {col_type};")
             print(f"Added missing column `{col_name}` to `{table_name}`.")
 
-def insert_data(cursor, table_name, data):
-    columns = ", ".join([f"`{key}`" for key in data.keys()])
-    placeholders = ", ".join(["%s"] * len(data))
-    query = f"INSERT INTO `{table_name}` ({columns}) VALUES ({placeholders})"
+def insert_row(cursor, query, row):
     try:
-        cursor.execute(query, list(data.values()))
+        cursor.execute(query, row)
     except Error as e:
-        print(f"MySQL Error inserting into {table_name}: {e}")
+        print(f"MySQL Error inserting row: {e}")
 
 def trim_table(cursor, table_name, row_limit=50):
     query = f"""
@@ -148,91 +172,473 @@ def trim_table(cursor, table_name, row_limit=50):
     """
     cursor.execute(query)
 
-def main():
-    hostname = socket.gethostname()
-    storage_table_name = f"{hostname}_storage"
+CONFIG_FILE = 'backendItems/config.ini'
+FEATURE_SECTIONS = {
+    'collector': ('collector',),
+    'energy': ('energy',),
+    'processes': ('processes',),
+    'disk': ('disk',),
+    'network': ('network',),
+    'alerts': ('alerts', 'alert:'),
+    'compression': ('compression', 'compression_tolerances'),
+    'sketches': ('sketches',),
+    'chunks': ('chunks', 'chunk_groups'),
+    'memory': ('memory',),
+    'discovery': ('discovery',),
+    'delivery': ('delivery',),
+    'stream': ('stream',),
+}
 
-    connection = create_connection()
-    if not connection:
-        return
+class Collector:
+    # Owns the database connection and every optional feature so that a SIGHUP
+    # (or an edited config file) can be applied between two samples: only the
+    # features whose sections changed are rebuilt, and a new [database] target is
+    # connected before the old connection is flushed and closed.
+    def __init__(self, config_file=CONFIG_FILE):
+        self.config_file = config_file
+        self.hostname = socket.gethostname()
+        self.storage_table_name = f"{self.hostname}_storage"
+        self.sections = {}
+        self.config_mtime = None
+        self.reload_requested = False
+        self.db_config = None
+        self.connection = None
+        self.cursor = None
+        self.latest_cursor = None
+        self.storage_cursor = None
+        self.build_row = make_row_builder()
+        self.latest_insert = insert_query(self.hostname)
+        self.storage_insert = insert_query(self.storage_table_name, idempotent=True)
+        self.ledger = DeliveryLedger(self.hostname)
+        self.ledger_interval = 60.0
+        # compressed, sketch, chunk and alert rows waiting for a committed transaction
+        self.outbox = deque(maxlen=1000)
+        self.last_ledger_flush = time.monotonic()
+        self.device_info = None
+        self.interval = 5.0
+        self.adaptive = None
+        self.process_collector = None
+        self.disk_collector = None
+        self.network_collector = None
+        self.network_enabled = False
+        self.alert_engine = None
+        self.compressor = None
+        self.replace_storage = False
+        self.sketches = None
+        self.chunk_writer = None
+        self.chunks_replace_storage = False
+        self.memory_guard = None
+        self.discovery = None
+        self.energy = None
+        self.stream = None
 
-    try:
-        cursor = connection.cursor()
-        create_table_if_missing(cursor, hostname)
-        create_table_if_missing(cursor, storage_table_name)
+    def request_reload(self, signum=None, frame=None):
+        self.reload_requested = True
+
+    def config_changed(self):
+        try:
+            mtime = os.stat(self.config_file).st_mtime
+        except OSError:
+            return False
+        changed = self.config_mtime is not None and mtime != self.config_mtime
+        self.config_mtime = mtime
+        return changed
+
+    def section(self, name):
+        return self.sections.get(name, {})
+
+    def feature_config(self, sections, feature):
+        return {k: v for k, v in sections.items() if k.startswith(FEATURE_SECTIONS[feature])}
+
+    def connect(self, db_config):
+        connection = create_connection(db_config)
+        if not connection:
+            return False
+        if self.connection:
+            try:
+                self.flush()
+                self.connection.commit()
+                self.ledger.committed()
+            except Error as e:
+                print(f"MySQL Error flushing the old connection: {e}")
+                self.ledger.rolled_back()
+            self.close_connection()
+        self.connection = connection
+        self.db_config = db_config
+        self.cursor = connection.cursor(buffered=True)
+        create_table_if_missing(self.cursor, self.hostname)
+        create_table_if_missing(self.cursor, self.storage_table_name)
+        add_missing_columns(self.cursor, self.hostname, COLUMN_TYPES)
+        add_missing_columns(self.cursor, self.storage_table_name, COLUMN_TYPES)
+        add_unique_key(self.cursor, self.storage_table_name, 'uniq_boot_seq', ('boot_id', 'seq'))
+        create_ledger_table(self.cursor)
+        create_heartbeat_table(self.cursor)
+        self.ledger.resume(self.cursor, self.storage_table_name)
+        # one server-side prepared statement per table, prepared on first execute
+        self.latest_cursor = connection.cursor(prepared=True)
+        self.storage_cursor = connection.cursor(prepared=True)
         connection.commit()
+        return True
+
+    def configure(self, initial=False):
+        sections = read_config_sections(self.config_file)
+        db_changed = False
+        db_config = sections.get('database')
+        if db_config is None:
+            raise Exception(f'Section database not found in {self.config_file}')
+        if db_config != self.db_config:
+            if self.connect(db_config):
+                db_changed = not initial
+            elif initial:
+                return False
+            else:
+                print("Keeping the current database connection")
+
+        changed = [feature for feature in FEATURE_SECTIONS
+                   if initial or db_changed
+                   or self.feature_config(sections, feature) != self.feature_config(self.sections, feature)]
+        # every changed feature is built before any is swapped in, so a bad value
+        # raises here and the running collector keeps all of its old settings
+        staged = {}
+        for feature in changed:
+            staged[feature] = getattr(self, f'build_{feature}')(sections.get(feature, {}), staged)
+        for feature, attrs in staged.items():
+            self.swap(attrs)
+            if not initial:
+                print(f"Applied [{feature}] configuration")
+        self.sections = sections
+        self.connection.commit()
+        return True
+
+    def swap(self, attrs):
+        # flush or stop what the old objects still hold, then switch to the new ones
+        old = {name: getattr(self, name, None) for name in attrs}
+        if old.get('compressor'):
+            self.post(insert_compressed_samples, self.hostname, old['compressor'].flush())
+        if old.get('sketches'):
+            self.post(insert_sketches, self.hostname, old['sketches'].flush())
+        if old.get('chunk_writer'):
+            self.post(insert_chunks, self.hostname, old['chunk_writer'].flush())
+        if old.get('discovery'):
+            old['discovery'].flush(self.cursor)
+        for name in ('energy', 'stream'):
+            if old.get(name):
+                old[name].stop()
+        for name, value in attrs.items():
+            setattr(self.ledger if name == 'max_pending' else self, name, value)
+        for name in ('energy', 'stream'):
+            if attrs.get(name):
+                attrs[name].start()
+
+    def memory_guard_for(self, staged):
+        return staged['memory']['memory_guard'] if 'memory' in staged else self.memory_guard
+
+    def build_collector(self, config, staged):
+        interval = float(config.get('interval', 5))
+        adaptive = None
+        if is_enabled(config, 'adaptive'):
+            adaptive = AdaptiveInterval(
+                interval,
+                min_interval=float(config.get('min_interval', 1)),
+                max_interval=float(config.get('max_interval', 30)),
+                temp_limit=float(config.get('temp_limit', 85)),
+                temp_margin=float(config.get('temp_margin', 10)),
+                change_threshold=float(config.get('change_threshold', 0.1)))
+            interval = adaptive.interval
+        return {'interval': interval, 'adaptive': adaptive}
+
+    def build_energy(self, config, staged):
+        energy = None
+        if is_enabled(config):
+            energy = EnergyIntegrator(float(config.get('rate_hz', 50)))
+        return {'energy': energy}
+
+    def build_processes(self, config, staged):
+        process_collector = None
+        if is_enabled(config):
+            process_collector = ProcessCollector(int(config.get('top_n', 10)))
+            create_process_table(self.cursor)
+        return {'process_collector': process_collector}
+
+    def build_disk(self, config, staged):
+        disk_collector = None
+        if is_enabled(config):
+            disk_collector = DiskCollector()
+            create_disk_table(self.cursor)
+        return {'disk_collector': disk_collector}
+
+    def build_network(self, config, staged):
+        network_collector = NetworkCollector(self.db_config['host'], float(config.get('ip_check_interval', 60)))
+        if is_enabled(config):
+            create_network_table(self.cursor)
+        return {'network_collector': network_collector, 'network_enabled': is_enabled(config)}
 
-        device_info = gather_device_info()
-        column_types = {'vpi': 'TEXT', 'vulkan': 'TEXT', 'opencv': 'TEXT'}
-
-        with jtop() as jetson:
-            while jetson.ok():
-                stats = jetson.stats
-                disk_space_gb = get_disk_space_gb()
-
-                data = {
-                    'time': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
-                    'uptime': stats.get('uptime'),
-                    'cpu1': stats.get('CPU1', 0), 'cpu2': stats.get('CPU2', 0),
-                    'cpu3': stats.get('CPU3', 0), 'cpu4': stats.get('CPU4', 0),
-                    'cpu5': stats.get('CPU5', 0), 'cpu6': stats.get('CPU6', 0),
-                    'ram': stats.get('RAM', 0.0), 'swap': stats.get('SWAP', 0),
-                    'emc': stats.get('EMC', 0), 'gpu': stats.get('GPU', 0),
-                    'ape': stats.get('APE', 'OFF'), 'nvdec': stats.get('NVDEC', 'OFF'),
-                    'nvjpg': stats.get('NVJPG', 'OFF'), 'nvjpg1': stats.get('NVJPG1', 'OFF'),
-                    'ofa': stats.get('OFA', 'OFF'), 'se': stats.get('SE', 'OFF'),
-                    'vic': stats.get('VIC', 'OFF'),
-                    'fan_pwmfan0': stats.get('Fan pwmfan0', 0.0),
-                    'temp_cpu': stats.get('Temp CPU', 0.0),
-                    'temp_cv0': stats.get('Temp CV0', 0.0),
-                    'temp_cv1': stats.get('Temp CV1', 0.0),
-                    'temp_cv2': stats.get('Temp CV2', 0.0),
-                    'temp_gpu': stats.get('Temp GPU', 0.0),
-                    'temp_soc0': stats.get('Temp SOC0', 0.0),
-                    'temp_soc1': stats.get('Temp SOC1', 0.0),
-                    'temp_soc2': stats.get('Temp SOC2', 0.0),
-                    'temp_tj': stats.get('Temp tj', 0.0),
-                    'power_vdd_cpu_gpu_cv': stats.get('Power VDD_CPU_GPU_CV', 0),
-                    'power_vdd_soc': stats.get('Power VDD_SOC', 0),
-                    'power_tot': stats.get('Power TOT', 0),
-                    'jetson_clocks': stats.get('jetson_clocks', 'OFF'),
-                    'nvp_model': stats.get('nvp model', 'UNKNOWN'),
-                    'disk_available_gb': disk_space_gb,
-                    'hostname': device_info.get('hostname'),
-                    'ip_address': device_info.get('ip_address'),
-                    'model': device_info.get('model'),
-                    'jetpack': device_info.get('jetpack'),
-                    'l4t': device_info.get('l4t'),
-                    'nv_power_mode': device_info.get('nv_power_mode'),
-                    'serial_number': device_info.get('serial_number'),
-                    'p_number': device_info.get('p_number'),
-                    'module': device_info.get('module'),
-                    'distribution': device_info.get('distribution'),
-                    'cuda': device_info.get('cuda'),
-                    'cudnn': device_info.get('cudnn'),
-                    'tensorrt': stats.get('tensorrt', ''),
-                    'vpi': stats.get('vpi', ''),
-                    'vulkan': stats.get('vulkan', ''),
-                    'opencv': stats.get('opencv', '')
-                }
-
-                add_missing_columns(cursor, hostname, column_types)
-                add_missing_columns(cursor, storage_table_name, column_types)
-
-                insert_data(cursor, hostname, data)
-                insert_data(cursor, storage_table_name, data)
+    def build_alerts(self, config, staged):
+        alert_engine = None
+        if is_enabled(config):
+            alert_engine = AlertEngine(load_alert_rules(self.config_file), config.get('hook') or None)
+            create_alert_table(self.cursor)
+        return {'alert_engine': alert_engine}
+
+    def build_compression(self, config, staged):
+        compressor = None
+        if is_enabled(config):
+            compressor = SeriesCompressor(load_tolerances(self.config_file),
+                                          config.get('algorithm', 'swinging_door'),
+                                          float(config.get('max_gap', 0)) or None)
+            create_compressed_table(self.cursor)
+        return {'compressor': compressor,
+                'replace_storage': compressor is not None and is_enabled(config, 'replace_storage')}
+
+    def build_sketches(self, config, staged):
+        sketches = None
+        if is_enabled(config):
+            sketches = SketchCollector(
+                [m.strip() for m in config.get('metrics', 'temp_tj, power_tot').split(',') if m.strip()],
+                window=int(config.get('window', 300)),
+                relative_accuracy=float(config.get('relative_accuracy', 0.01)),
+                max_bins=int(config.get('max_bins', 2048)))
+            create_sketch_table(self.cursor)
+        return {'sketches': sketches}
+
+    def build_chunks(self, config, staged):
+        chunk_writer = None
+        if is_enabled(config):
+            if ChunkWriter is None:
+                raise Exception('[chunks] is enabled but numpy is not installed')
+            chunk_writer = ChunkWriter(load_groups(self.config_file),
+                                       chunk_size=int(config.get('chunk_size', 60)),
+                                       max_span=float(config.get('max_span', 3600)))
+            create_chunk_table(self.cursor)
+        return {'chunk_writer': chunk_writer,
+                'chunks_replace_storage': chunk_writer is not None and is_enabled(config, 'replace_storage')}
+
+    def build_memory(self, config, staged):
+        memory_guard = None
+        if is_enabled(config):
+            memory_guard = MemoryGuard(
+                float(config.get('budget_mb', 64)),
+                shed_order=[f.strip() for f in config.get('shed_order', '').split(',') if f.strip()],
+                report_interval=float(config.get('report_interval', 60)),
+                use_tracemalloc=is_enabled(config, 'tracemalloc'),
+                top_n=int(config.get('top_allocators', 5)))
+            create_stats_table(self.cursor)
+        return {'memory_guard': memory_guard}
+
+    def build_discovery(self, config, staged):
+        discovery = None
+        if is_enabled(config):
+            memory_guard = self.memory_guard_for(staged)
+            max_buffer = int(config.get('max_buffer', 20000))
+            sources = [s.strip() for s in config.get('sources', 'stats, cpu, gpu, power, temperature, fan, memory').split(',') if s.strip()]
+            batch_size = int(config.get('batch_size', 500))
+            flush_interval = float(config.get('flush_interval', 30))
+            create_discovery_tables(self.cursor)
+            discovery = MetricDiscovery(
+                self.cursor, self.hostname, sources=sources, batch_size=batch_size, flush_interval=flush_interval,
+                max_buffer=memory_guard.cap(max_buffer, 100) if memory_guard else max_buffer)
+        return {'discovery': discovery}
+
+    def build_delivery(self, config, staged):
+        max_pending = int(config.get('max_pending', 1000))
+        memory_guard = self.memory_guard_for(staged)
+        if memory_guard:
+            max_pending = memory_guard.cap(max_pending, 2000)
+        return {'ledger_interval': float(config.get('ledger_interval', 60)), 'max_pending': max_pending}
+
+    def build_stream(self, config, staged):
+        stream = None
+        if is_enabled(config):
+            stream = StreamPublisher(config.get('url', f"http://{self.db_config['host']}:3004"),
+                                     token=config.get('token') or None,
+                                     max_queue=int(config.get('max_queue', 100)))
+        return {'stream': stream}
+
+    def reload(self):
+        self.reload_requested = False
+        print(f"Reloading configuration from {self.config_file}")
+        try:
+            self.configure()
+        except Exception as e:
+            print(f"Configuration reload failed, keeping the current settings: {e}")
+
+    def shed(self, feature):
+        if feature == 'processes':
+            self.process_collector = None
+        elif feature == 'compression' and self.compressor:
+            self.post(insert_compressed_samples, self.hostname, self.compressor.flush())
+            self.compressor = None
+            self.replace_storage = False  # full rows go to <hostname>_storage again
+        elif feature == 'chunks' and self.chunk_writer:
+            self.post(insert_chunks, self.hostname, self.chunk_writer.flush())
+            self.chunk_writer = None
+            self.chunks_replace_storage = False
+        elif feature == 'alerts':
+            self.alert_engine = None
+        elif feature == 'discovery' and self.discovery:
+            self.discovery.flush(self.cursor)
+            self.discovery = None
+        self.memory_guard.release()
+
+    def sample(self, jetson):
+        hostname = self.hostname
+        stats = jetson.stats
+        self.device_info['ip_address'] = self.network_collector.check_ip() or self.device_info.get('ip_address')
+        timestamp = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        seq = self.ledger.next_seq()
+        sample = {
+            'time': timestamp,
+            'disk_available_gb': get_disk_space_gb(),
+            'sample_interval': self.interval,
+            'boot_id': self.ledger.boot_id,
+            'seq': seq
+        }
+        if self.energy:
+            sample.update(self.energy.snapshot())
+        row = self.build_row(stats, self.device_info, sample)
+        if self.stream:
+            self.stream.publish(row)
+        needs_data = self.alert_engine or self.compressor or self.sketches or self.chunk_writer or self.adaptive
+        data = dict(zip(COLUMNS, row)) if needs_data else None
+
+        # the in-memory features run whether or not the database is reachable;
+        # only their inserts wait in the outbox for the next committed transaction
+        now = time.time()
+        if self.alert_engine:
+            events = self.alert_engine.evaluate(data)
+            self.alert_engine.notify(events)
+            self.post(self.alert_engine.record, timestamp, hostname, events)
+        if self.compressor:
+            self.post(insert_compressed_samples, hostname, self.compressor.add(data, now))
+        if self.sketches:
+            self.post(insert_sketches, hostname, self.sketches.add(data, now))
+        if self.chunk_writer:
+            self.post(insert_chunks, hostname, self.chunk_writer.add(data, now))
+
+        keep_storage = not (self.replace_storage or self.chunks_replace_storage)
+        if keep_storage:
+            self.ledger.queue(row, timestamp, seq)
+        if self.connection is None and not self.reconnect():
+            print(f"Database unavailable, {len(self.ledger.pending)} samples pending")
+        else:
+            cursor = self.cursor  # read after the reconnect check: a reconnect replaces it
+            try:
+                insert_row(self.latest_cursor, self.latest_insert, row)
+                sent = len(self.outbox)
+                for insert, args in list(self.outbox):
+                    insert(cursor, *args)
+                if keep_storage:
+                    self.ledger.deliver(self.storage_cursor, self.storage_insert)
+                if self.discovery:
+                    self.discovery.collect(cursor, jetson, stats)
+                if self.process_collector:
+                    process_rows = self.process_collector.collect(getattr(jetson, 'processes', None))
+                    insert_process_samples(cursor, timestamp, hostname, process_rows)
+                if self.disk_collector:
+                    insert_disk_samples(cursor, timestamp, hostname, self.disk_collector.collect())
+                if self.network_enabled:
+                    insert_network_samples(cursor, timestamp, hostname, self.network_collector.collect())
                 trim_table(cursor, hostname)
-                connection.commit()
-                time.sleep(5)
+                update_heartbeat(cursor, hostname, self.ledger.boot_id, seq, self.interval)
+                if time.monotonic() - self.last_ledger_flush >= self.ledger_interval:
+                    self.last_ledger_flush = time.monotonic()
+                    self.ledger.flush(cursor)
+                if self.memory_guard:
+                    for feature in self.memory_guard.check(cursor, timestamp, hostname):
+                        self.shed(feature)
+                self.connection.commit()
+                self.ledger.committed()
+                for _ in range(sent):
+                    self.outbox.popleft()
+            except Error as e:
+                # nothing from this transaction is counted; its storage rows go back to
+                # pending and the outbox keeps its rows for the next attempt
+                print(f"MySQL Error, rolling back this sample: {e}")
+                self.ledger.rolled_back()
+                self.recover(e)
+        if self.adaptive:
+            self.interval = self.adaptive.next_interval(data)
 
-    except Error as e:
-        print(f"MySQL Error: {e}")
+    def post(self, insert, *args):
+        if args[-1]:
+            if len(self.outbox) == self.outbox.maxlen:
+                print("Outbox full, dropping the oldest compressed/sketch/chunk/alert rows")
+            self.outbox.append((insert, args))
 
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
-            print("MySQL connection is closed")
+    def reconnect(self):
+        if self.connection:
+            try:
+                self.close_connection()
+            except Error:
+                self.connection = None
+        return self.connect(self.db_config)
+
+    def recover(self, error):
+        try:
+            self.connection.rollback()
+        except Error:
+            pass
+        if is_transient(error) and not self.connection.is_connected():
+            # the rows stay in the ledger's pending queue until a connection is back
+            print("Lost the database connection, reconnecting")
+            self.reconnect()
+
+    def flush(self):
+        if self.compressor:
+            insert_compressed_samples(self.cursor, self.hostname, self.compressor.flush())
+        if self.sketches:
+            insert_sketches(self.cursor, self.hostname, self.sketches.flush())
+        if self.chunk_writer:
+            insert_chunks(self.cursor, self.hostname, self.chunk_writer.flush())
+        if self.discovery:
+            self.discovery.flush(self.cursor)
+        self.ledger.flush(self.cursor)
+
+    def close_connection(self):
+        for cursor in (self.latest_cursor, self.storage_cursor, self.cursor):
+            if cursor:
+                cursor.close()
+        self.connection.close()
+        self.connection = None
+        print("MySQL connection is closed")
+
+    def run(self):
+        if not self.configure(initial=True):
+            return
+        self.config_changed()
+        signal.signal(signal.SIGHUP, self.request_reload)
+        try:
+            self.device_info = gather_device_info()
+            backend = self.section('collector').get('backend', 'jtop')
+            with open_sampler(backend) as jetson:
+                while jetson.ok():
+                    if self.reload_requested or (is_enabled(self.section('collector'), 'watch_config')
+                                                 and self.config_changed()):
+                        self.reload()
+                        if self.section('collector').get('backend', 'jtop') != backend:
+                            print("Changing the sampler backend requires a restart")
+                    self.sample(jetson)
+                    time.sleep(self.interval)
+
+        except Error as e:
+            print(f"MySQL Error: {e}")
+
+        finally:
+            if self.energy:
+                self.energy.stop()
+            if self.stream:
+                self.stream.stop()
+            if self.connection and self.connection.is_connected():
+                try:
+                    self.flush()
+                    self.connection.commit()
+                    self.ledger.committed()
+                except Error as e:
+                    print(f"MySQL Error flushing on exit: {e}")
+                self.close_connection()
+
+def main():
+    Collector().run()
 
 if __name__ == '__main__':
     main()
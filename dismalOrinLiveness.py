@@ -0,0 +1,179 @@
+import time
+import argparse
+import mysql.connector
+from mysql.connector import Error
+
+HEARTBEAT_TABLE = 'device_heartbeats'
+STATUS_TABLE = 'device_status'
+# one primary-key upsert per sample; last_seen is the server clock so device
+# clock skew cannot make a live collector look stale. samples restarts at 1
+# on a new boot (MySQL applies the assignments left to right).
+HEARTBEAT_UPSERT = (f"INSERT INTO `{HEARTBEAT_TABLE}` (hostname, last_seen, boot_id, seq, sample_interval, samples) "
+                    f"VALUES (%s, UTC_TIMESTAMP(3), %s, %s, %s, 1) ON DUPLICATE KEY UPDATE "
+                    f"samples = IF(boot_id <=> VALUES(boot_id), samples + 1, 1), last_seen = VALUES(last_seen), "
+                    f"boot_id = VALUES(boot_id), seq = VALUES(seq), sample_interval = VALUES(sample_interval)")
+
+
+def create_heartbeat_table(cursor):
+    try:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS `{HEARTBEAT_TABLE}` (
+                hostname VARCHAR(255) PRIMARY KEY,
+                last_seen DATETIME(3) NOT NULL,
+                boot_id CHAR(36),
+                seq BIGINT,
+                sample_interval FLOAT,
+                samples BIGINT NOT NULL DEFAULT 0
+            );
+        """)
+    except Error as e:
+        print(f"Error creating table `{HEARTBEAT_TABLE}`: {e}")
+
+
+def update_heartbeat(cursor, hostname, boot_id, seq, sample_interval):
+    try:
+        cursor.execute(HEARTBEAT_UPSERT, (hostname, boot_id, seq, sample_interval))
+    except Error as e:
+        print(f"MySQL Error updating {HEARTBEAT_TABLE}: {e}")
+
+
+def create_status_table(cursor):
+    try:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS `{STATUS_TABLE}` (
+                hostname VARCHAR(255) PRIMARY KEY,
+                status VARCHAR(10) NOT NULL,
+                since DATETIME(3) NOT NULL,
+                checked DATETIME(3) NOT NULL,
+                last_seen DATETIME(3),
+                age_s DOUBLE,
+                expected_interval DOUBLE,
+                observed_interval DOUBLE,
+                rate_drop_pct DOUBLE,
+                boot_id CHAR(36),
+                samples BIGINT
+            );
+        """)
+    except Error as e:
+        print(f"Error creating table `{STATUS_TABLE}`: {e}")
+
+
+class LivenessChecker:
+    # Compares every heartbeat row with the previous check: the age of last_seen
+    # against the learned interval decides stale, and samples gained per second
+    # against the expected rate gives the rate drop that decides degraded. The
+    # expected interval is an EWMA of healthy observations, seeded with the
+    # interval the collector reports.
+    def __init__(self, stale_factor=3.0, min_stale=30.0, degraded_pct=30.0, alpha=0.1):
+        self.stale_factor = stale_factor
+        self.min_stale = min_stale
+        self.degraded_pct = degraded_pct
+        self.alpha = alpha
+        self.previous = {}
+
+    def load(self, cursor):
+        cursor.execute(f"SELECT hostname, status, since, checked, expected_interval, boot_id, samples FROM `{STATUS_TABLE}`")
+        for hostname, status, since, checked, expected, boot_id, samples in cursor.fetchall():
+            self.previous[hostname] = {'status': status, 'since': since, 'checked': checked,
+                                       'expected': expected, 'boot_id': boot_id, 'samples': samples}
+
+    def evaluate(self, hostname, last_seen, boot_id, sample_interval, samples, now):
+        previous = self.previous.get(hostname, {})
+        reported = float(sample_interval) if sample_interval else None
+        expected = previous.get('expected') or reported or 5.0
+        age = (now - last_seen).total_seconds()
+        # the collector changed its own interval (adaptive sampling): start from the
+        # new one rather than creeping toward it, and skip the rate over a window
+        # that straddles the change
+        retuned = reported is not None and previous.get('reported') not in (None, reported)
+        if retuned:
+            expected = reported
+
+        observed = None
+        if (not retuned and previous.get('checked') and previous.get('boot_id') == boot_id
+                and previous.get('samples') is not None):
+            elapsed = (now - previous['checked']).total_seconds()
+            gained = samples - previous['samples']
+            if elapsed > 0:
+                observed = elapsed / gained if gained > 0 else float('inf')
+        rate_drop = max(0.0, 100.0 * (1.0 - expected / observed)) if observed else None
+
+        if age > max(self.min_stale, self.stale_factor * expected):
+            status = 'stale'
+        elif rate_drop is not None and rate_drop >= self.degraded_pct:
+            status = 'degraded'
+        else:
+            status = 'ok'
+
+        # learn from healthy windows, or when the collector itself says it slowed down
+        if observed and observed != float('inf') and (
+                status == 'ok' or (reported and abs(observed - reported) <= 0.2 * reported)):
+            expected += self.alpha * (observed - expected)
+
+        since = previous.get('since') if previous.get('status') == status else now
+        if previous.get('status') and previous['status'] != status:
+            print(f"{hostname}: {previous['status']} -> {status} (age {age:.1f}s, expected every {expected:.1f}s"
+                  f"{f', rate down {rate_drop:.0f}%' if rate_drop else ''})")
+        self.previous[hostname] = {'status': status, 'since': since, 'checked': now, 'expected': expected,
+                                   'boot_id': boot_id, 'samples': samples, 'reported': reported}
+        return (hostname, status, since, now, last_seen, round(age, 3), round(expected, 3),
+                None if observed in (None, float('inf')) else round(observed, 3),
+                None if rate_drop is None else round(rate_drop, 1), boot_id, samples)
+
+    def check(self, cursor):
+        cursor.execute(f"SELECT hostname, last_seen, boot_id, sample_interval, samples, UTC_TIMESTAMP(3) "
+                       f"FROM `{HEARTBEAT_TABLE}`")
+        rows = [self.evaluate(*row[:5], now=row[5]) for row in cursor.fetchall()]
+        if rows:
+            cursor.executemany(
+                f"INSERT INTO `{STATUS_TABLE}` (hostname, status, since, checked, last_seen, age_s, expected_interval, "
+                f"observed_interval, rate_drop_pct, boot_id, samples) VALUES "
+                f"(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE status = VALUES(status), "
+                f"since = VALUES(since), checked = VALUES(checked), last_seen = VALUES(last_seen), age_s = VALUES(age_s), "
+                f"expected_interval = VALUES(expected_interval), observed_interval = VALUES(observed_interval), "
+                f"rate_drop_pct = VALUES(rate_drop_pct), boot_id = VALUES(boot_id), samples = VALUES(samples)", rows)
+        return rows
+
+
+def main():
+    from dismalOrinGather import read_db_config, read_config
+    liveness_config = read_config('liveness')
+    parser = argparse.ArgumentParser(description='Mark devices ok, degraded or stale from the heartbeat table')
+    parser.add_argument('--every', type=float, default=float(liveness_config.get('check_interval', 30)),
+                        help='seconds between checks')
+    parser.add_argument('--once', action='store_true', help='check once and exit (for cron or a timer)')
+    parser.add_argument('--stale-factor', type=float, default=float(liveness_config.get('stale_factor', 3)))
+    parser.add_argument('--min-stale', type=float, default=float(liveness_config.get('min_stale', 30)))
+    parser.add_argument('--degraded-pct', type=float, default=float(liveness_config.get('degraded_pct', 30)))
+    args = parser.parse_args()
+
+    checker = LivenessChecker(args.stale_factor, args.min_stale, args.degraded_pct)
+    connection = None
+    while True:
+        try:
+            if not connection or not connection.is_connected():
+                connection = mysql.connector.connect(**read_db_config())
+                cursor = connection.cursor()
+                create_heartbeat_table(cursor)
+                create_status_table(cursor)
+                checker.load(cursor)
+            started = time.perf_counter()
+            rows = checker.check(cursor)
+            connection.commit()
+            counts = {}
+            for row in rows:
+                counts[row[1]] = counts.get(row[1], 0) + 1
+            print(f"Checked {len(rows)} devices in {(time.perf_counter() - started) * 1000:.1f} ms: "
+                  + ", ".join(f"{n} {status}" for status, n in sorted(counts.items())))
+        except Error as e:
+            print(f"MySQL Error: {e}")
+            connection = None
+        if args.once:
+            break
+        time.sleep(args.every)
+    if connection:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+import csv
+import time
+import uuid
+import random
+import argparse
+import threading
+from datetime import datetime
+import numpy as np
+import mysql.connector
+from mysql.connector import Error
+from dismalOrinGather import read_db_config, read_config, create_table_if_missing, add_missing_columns, trim_table
+from dismalOrinDelivery import add_unique_key
+from dismalOrinLiveness import HEARTBEAT_TABLE, HEARTBEAT_UPSERT, create_heartbeat_table
+from dismalOrinMetrics import COLUMNS, COLUMN_TYPES, insert_query, make_row_builder, synthetic_stats, synthetic_device
+from dismalOrinDashboards import load_panel_queries, retarget_query
+
+WRITE_MODES = ('dict', 'prepared')
+SCHEMAS = ('wide', 'time_index')
+LOCK_ERRORS = (1205, 1213)  # lock wait timeout, deadlock
+LOCK_STATUS = ('Innodb_row_lock_waits', 'Innodb_row_lock_time')
+
+
+def prepare_tables(cursor, names, schema):
+    for name in names:
+        for table_name in (name, f"{name}_storage"):
+            cursor.execute(f"DROP TABLE IF EXISTS `{table_name}`")
+            create_table_if_missing(cursor, table_name)
+            add_missing_columns(cursor, table_name, COLUMN_TYPES)
+            if schema == 'time_index':
+                cursor.execute(f"ALTER TABLE `{table_name}` ADD INDEX `idx_time` (`time`)")
+        add_unique_key(cursor, f"{name}_storage", 'uniq_boot_seq', ('boot_id', 'seq'))
+    create_heartbeat_table(cursor)
+    cursor.execute(f"DELETE FROM `{HEARTBEAT_TABLE}` WHERE hostname IN ({', '.join(['%s'] * len(names))})", names)
+
+
+def data_query(table_name, data, idempotent=False):
+    # the old dict write path: the statement is rebuilt from the keys every sample
+    columns = ", ".join(f"`{key}`" for key in data)
+    query = f"INSERT INTO `{table_name}` ({columns}) VALUES ({', '.join(['%s'] * len(data))})"
+    return query + " ON DUPLICATE KEY UPDATE `id` = `id`" if idempotent else query
+
+
+def lock_status(cursor):
+    cursor.execute(f"SHOW GLOBAL STATUS WHERE Variable_name IN ({', '.join(['%s'] * len(LOCK_STATUS))})", LOCK_STATUS)
+    return {name: int(value) for name, value in cursor.fetchall()}
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {'write': [], 'query': []}
+        self.errors = {'write': 0, 'query': 0, 'lock': 0}
+
+    def add(self, kind, seconds):
+        with self.lock:
+            self.latencies[kind].append(seconds * 1000.0)
+
+    def error(self, kind, e):
+        with self.lock:
+            self.errors[kind] += 1
+            if getattr(e, 'errno', None) in LOCK_ERRORS:
+                self.errors['lock'] += 1
+
+
+def run_device(db_config, name, interval, write_mode, stop, recorder):
+    # the collector's per-sample write path: latest + idempotent storage insert,
+    # trim, heartbeat upsert, commit. Statements run on the cursors directly so
+    # a failed write reaches the recorder instead of being printed and skipped.
+    rng = random.Random(name)
+    build_row = make_row_builder()
+    device = synthetic_device(name)
+    storage_table = f"{name}_storage"
+    boot_id = str(uuid.uuid4())
+    seq = 0
+    connection = mysql.connector.connect(**db_config)
+    try:
+        cursor = connection.cursor(buffered=True)
+        if write_mode == 'prepared':
+            latest_cursor = connection.cursor(prepared=True)
+            storage_cursor = connection.cursor(prepared=True)
+            latest_insert, storage_insert = insert_query(name), insert_query(storage_table, idempotent=True)
+        stop.wait(rng.uniform(0, interval))
+        next_due = time.monotonic()
+        while not stop.is_set():
+            seq += 1
+            sample = {'time': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+                      'disk_available_gb': round(rng.uniform(10, 50), 2), 'sample_interval': interval,
+                      'boot_id': boot_id, 'seq': seq}
+            row = build_row(synthetic_stats(rng), device, sample)
+            started = time.perf_counter()
+            try:
+                if write_mode == 'prepared':
+                    latest_cursor.execute(latest_insert, row)
+                    storage_cursor.execute(storage_insert, row)
+                else:
+                    data = dict(zip(COLUMNS, row))
+                    cursor.execute(data_query(name, data), list(data.values()))
+                    cursor.execute(data_query(storage_table, data, idempotent=True), list(data.values()))
+                trim_table(cursor, name)
+                cursor.execute(HEARTBEAT_UPSERT, (name, boot_id, seq, interval))
+                connection.commit()
+                recorder.add('write', time.perf_counter() - started)
+            except Error as e:
+                recorder.error('write', e)
+                connection.rollback()
+            next_due += interval
+            stop.wait(max(0.0, next_due - time.monotonic()))
+    finally:
+        connection.close()
+
+
+def run_viewer(db_config, queries, refresh, stop, recorder, seed):
+    # one open dashboard: every panel query once per refresh
+    connection = mysql.connector.connect(**db_config)
+    try:
+        cursor = connection.cursor()
+        stop.wait(random.Random(seed).uniform(0, refresh))
+        next_due = time.monotonic()
+        while not stop.is_set():
+            for sql in queries:
+                started = time.perf_counter()
+                try:
+                    cursor.execute(sql)
+                    cursor.fetchall()
+                    recorder.add('query', time.perf_counter() - started)
+                except Error as e:
+                    recorder.error('query', e)
+            next_due += refresh
+            stop.wait(max(0.0, next_due - time.monotonic()))
+    finally:
+        connection.close()
+
+
+def percentiles(values):
+    if not values:
+        return ['', '', '', '']
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return [round(p50, 2), round(p95, 2), round(p99, 2), round(max(values), 2)]
+
+
+def run_step(db_config, devices, viewers, args, panel_queries):
+    names = [f"{args.prefix}{i:03d}" for i in range(devices)]
+    connection = mysql.connector.connect(**db_config)
+    cursor = connection.cursor(buffered=True)
+    prepare_tables(cursor, names, args.schema)
+    connection.commit()
+    before = lock_status(cursor)
+
+    recorder = Recorder()
+    stop = threading.Event()
+    threads = [threading.Thread(target=run_device, args=(db_config, name, args.interval, args.write_mode, stop, recorder))
+               for name in names]
+    for i in range(viewers):
+        # each viewer has one dashboard open on one device
+        host = names[i % len(names)]
+        dashboard = panel_queries[i % len(panel_queries)]
+        refresh = args.refresh or dashboard[0]
+        queries = [retarget_query(sql, host, db_config['database']) for sql in dashboard[1]]
+        threads.append(threading.Thread(target=run_viewer, args=(db_config, queries, refresh, stop, recorder, i)))
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    after = lock_status(cursor)
+    connection.close()
+    writes, queries = recorder.latencies['write'], recorder.latencies['query']
+    return ([devices, viewers, len(writes), round(len(writes) / args.duration, 1)] + percentiles(writes) +
+            [recorder.errors['write'], after['Innodb_row_lock_waits'] - before['Innodb_row_lock_waits'],
+             after['Innodb_row_lock_time'] - before['Innodb_row_lock_time'], recorder.errors['lock'],
+             len(queries), round(len(queries) / args.duration, 1)] + percentiles(queries) + [recorder.errors['query']])
+
+
+HEADER = ['devices', 'viewers', 'writes', 'writes_per_s', 'write_p50_ms', 'write_p95_ms', 'write_p99_ms',
+          'write_max_ms', 'write_errors', 'row_lock_waits', 'row_lock_time_ms', 'lock_errors',
+          'queries', 'queries_per_s', 'query_p50_ms', 'query_p95_ms', 'query_p99_ms', 'query_max_ms', 'query_errors']
+
+
+def main():
+    load_config = read_config('loadtest')
+    parser = argparse.ArgumentParser(description='Simulate N collectors and dashboard viewers against a test database')
+    parser.add_argument('--host', default=load_config.get('host', 'localhost'),
+                        help='a local test MySQL/MariaDB server, never the [database] host')
+    parser.add_argument('--port', type=int, default=int(load_config.get('port', 3306)))
+    parser.add_argument('--database', default=load_config.get('database', 'orinLoadTest'))
+    parser.add_argument('--devices', type=int, nargs='+', default=[int(n) for n in load_config.get('devices', '5 10 20 40').split()])
+    parser.add_argument('--viewers-per-device', type=float, default=float(load_config.get('viewers_per_device', 0.5)))
+    parser.add_argument('--interval', type=float, default=float(read_config('collector').get('interval', 5)))
+    parser.add_argument('--refresh', type=float, help='dashboard refresh in seconds (default: from the dashboard JSON)')
+    parser.add_argument('--duration', type=float, default=float(load_config.get('duration', 60)), help='seconds per step')
+    parser.add_argument('--write-mode', choices=WRITE_MODES, default=load_config.get('write_mode', 'prepared'))
+    parser.add_argument('--schema', choices=SCHEMAS, default=load_config.get('schema', 'wide'))
+    parser.add_argument('--prefix', default='sim')
+    parser.add_argument('--dashboards', default=load_config.get('dashboards', 'dashboardItems/*.json'))
+    parser.add_argument('--output', help='also write the results to this CSV file')
+    args = parser.parse_args()
+
+    production = read_db_config()
+    if args.host.lower() == production['host'].lower():
+        # the simulated fleet would load the real server, and its lock counters
+        # would include the real collectors' traffic
+        print(f"Refusing to load test the production server {args.host}; set [loadtest] host or pass --host")
+        return
+    if args.database == production['database']:
+        print(f"Refusing to load test the production database `{args.database}`; pass --database")
+        return
+    db_config = {**production, 'host': args.host, 'port': args.port}
+    for key in ('username', 'password'):
+        if key in load_config:
+            db_config[key] = load_config[key]
+    dashboards = {}
+    for path, _, _, sql, refresh in load_panel_queries(args.dashboards):
+        dashboards.setdefault(path, (refresh, []))[1].append(sql)
+    panel_queries = list(dashboards.values())
+
+    try:
+        connection = mysql.connector.connect(**{k: v for k, v in db_config.items() if k != 'database'})
+        connection.cursor().execute(f"CREATE DATABASE IF NOT EXISTS `{args.database}`")
+        connection.close()
+    except Error as e:
+        print(f"MySQL Error: {e}")
+        return
+    db_config = {**db_config, 'database': args.database}
+
+    print(f"{args.host}:{args.port}, {args.write_mode} writes, {args.schema} schema, {sum(len(q) for _, q in panel_queries)} panel queries "
+          f"from {len(panel_queries)} dashboards, {args.duration:.0f}s per step")
+    print("\t".join(HEADER))
+    results = []
+    for devices in args.devices:
+        viewers = int(round(devices * args.viewers_per_device)) if panel_queries else 0
+        try:
+            result = run_step(db_config, devices, viewers, args, panel_queries)
+        except Error as e:
+            print(f"MySQL Error at {devices} devices: {e}")
+            break
+        results.append(result)
+        print("\t".join(str(v) for v in result))
+
+    if args.output and results:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['write_mode', 'schema'] + HEADER)
+            writer.writerows([args.write_mode, args.schema] + r for r in results)
+
+
+if __name__ == '__main__':
+    main()
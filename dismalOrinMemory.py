@@ -0,0 +1,93 @@
+import gc
+import json
+import time
+import tracemalloc
+import psutil
+from mysql.connector import Error
+
+STATS_TABLE = 'collector_stats'
+
+
+def create_stats_table(cursor):
+    try:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS `{STATS_TABLE}` (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                time DATETIME,
+                hostname VARCHAR(255),
+                rss_mb FLOAT,
+                budget_mb FLOAT,
+                traced_mb FLOAT,
+                traced_peak_mb FLOAT,
+                shed VARCHAR(255),
+                top_allocators TEXT,
+                INDEX idx_host_time (hostname, time)
+            );
+        """)
+    except Error as e:
+        print(f"Error creating table `{STATS_TABLE}`: {e}")
+
+
+class MemoryGuard:
+    # Watches the collector's own RSS against budget_mb. Above shed_ratio of the
+    # budget the next optional feature in shed_order is given up, one per check,
+    # so the collector degrades before it competes with inference for memory.
+    def __init__(self, budget_mb, shed_order=(), shed_ratio=0.9, report_interval=60,
+                 use_tracemalloc=False, top_n=5, buffer_share=0.25):
+        self.budget = budget_mb * 1024 * 1024
+        self.shed_order = list(shed_order)
+        self.shed_ratio = shed_ratio
+        self.report_interval = report_interval
+        self.use_tracemalloc = use_tracemalloc
+        self.top_n = top_n
+        self.buffer_share = buffer_share
+        self.shed = []
+        self.last_report = None
+        self.process = psutil.Process()
+        if use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start(1)
+
+    def cap(self, items, item_bytes):
+        # upper bound for a buffer of `items` entries of roughly `item_bytes` each
+        return max(1, min(items, int(self.budget * self.buffer_share // max(item_bytes, 1))))
+
+    def rss(self):
+        return self.process.memory_info().rss
+
+    def top_allocators(self):
+        snapshot = tracemalloc.take_snapshot()
+        stats = snapshot.statistics('lineno')[:self.top_n]
+        return [{'where': str(s.traceback[0]), 'kb': round(s.size / 1024, 1), 'count': s.count} for s in stats]
+
+    def check(self, cursor, timestamp, hostname):
+        rss = self.rss()
+        newly_shed = []
+        if rss > self.budget * self.shed_ratio and len(self.shed) < len(self.shed_order):
+            feature = self.shed_order[len(self.shed)]
+            self.shed.append(feature)
+            newly_shed.append(feature)
+            print(f"Memory {rss / 1024 ** 2:.1f} MB near budget {self.budget / 1024 ** 2:.0f} MB, shedding {feature}")
+
+        now = time.monotonic()
+        if newly_shed or self.last_report is None or now - self.last_report >= self.report_interval:
+            self.last_report = now
+            self.report(cursor, timestamp, hostname, rss)
+        return newly_shed
+
+    def report(self, cursor, timestamp, hostname, rss):
+        traced = peak = None
+        allocators = None
+        if self.use_tracemalloc:
+            traced, peak = tracemalloc.get_traced_memory()
+            traced, peak = traced / 1024 ** 2, peak / 1024 ** 2
+            allocators = json.dumps(self.top_allocators())
+        query = (f"INSERT INTO `{STATS_TABLE}` (time, hostname, rss_mb, budget_mb, traced_mb, traced_peak_mb, "
+                 f"shed, top_allocators) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)")
+        try:
+            cursor.execute(query, (timestamp, hostname, rss / 1024 ** 2, self.budget / 1024 ** 2, traced, peak,
+                                   ",".join(self.shed), allocators))
+        except Error as e:
+            print(f"MySQL Error inserting into {STATS_TABLE}: {e}")
+
+    def release(self):
+        gc.collect()
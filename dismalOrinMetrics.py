@@ -0,0 +1,133 @@
+from collections import namedtuple
+
+# One line per column of the <hostname> and <hostname>_storage tables.
+# source: 'stats' is jetson.stats, 'device' is gather_device_info(), 'sample' is
+# filled in by the collector loop (time, disk space, interval, identity, energy).
+Metric = namedtuple('Metric', ['column', 'source', 'key', 'sql_type', 'default'])
+
+METRICS = [
+    Metric('time', 'sample', 'time', 'DATETIME', None),
+    Metric('uptime', 'stats', 'uptime', 'VARCHAR(50)', None),
+    Metric('cpu1', 'stats', 'CPU1', 'INT', 0),
+    Metric('cpu2', 'stats', 'CPU2', 'INT', 0),
+    Metric('cpu3', 'stats', 'CPU3', 'INT', 0),
+    Metric('cpu4', 'stats', 'CPU4', 'INT', 0),
+    Metric('cpu5', 'stats', 'CPU5', 'INT', 0),
+    Metric('cpu6', 'stats', 'CPU6', 'INT', 0),
+    Metric('ram', 'stats', 'RAM', 'FLOAT', 0.0),
+    Metric('swap', 'stats', 'SWAP', 'INT', 0),
+    Metric('emc', 'stats', 'EMC', 'INT', 0),
+    Metric('gpu', 'stats', 'GPU', 'INT', 0),
+    Metric('ape', 'stats', 'APE', 'VARCHAR(10)', 'OFF'),
+    Metric('nvdec', 'stats', 'NVDEC', 'VARCHAR(10)', 'OFF'),
+    Metric('nvjpg', 'stats', 'NVJPG', 'VARCHAR(10)', 'OFF'),
+    Metric('nvjpg1', 'stats', 'NVJPG1', 'VARCHAR(10)', 'OFF'),
+    Metric('ofa', 'stats', 'OFA', 'VARCHAR(10)', 'OFF'),
+    Metric('se', 'stats', 'SE', 'VARCHAR(10)', 'OFF'),
+    Metric('vic', 'stats', 'VIC', 'VARCHAR(10)', 'OFF'),
+    Metric('fan_pwmfan0', 'stats', 'Fan pwmfan0', 'FLOAT', 0.0),
+    Metric('temp_cpu', 'stats', 'Temp CPU', 'FLOAT', 0.0),
+    Metric('temp_cv0', 'stats', 'Temp CV0', 'FLOAT', 0.0),
+    Metric('temp_cv1', 'stats', 'Temp CV1', 'FLOAT', 0.0),
+    Metric('temp_cv2', 'stats', 'Temp CV2', 'FLOAT', 0.0),
+    Metric('temp_gpu', 'stats', 'Temp GPU', 'FLOAT', 0.0),
+    Metric('temp_soc0', 'stats', 'Temp SOC0', 'FLOAT', 0.0),
+    Metric('temp_soc1', 'stats', 'Temp SOC1', 'FLOAT', 0.0),
+    Metric('temp_soc2', 'stats', 'Temp SOC2', 'FLOAT', 0.0),
+    Metric('temp_tj', 'stats', 'Temp tj', 'FLOAT', 0.0),
+    Metric('power_vdd_cpu_gpu_cv', 'stats', 'Power VDD_CPU_GPU_CV', 'INT', 0),
+    Metric('power_vdd_soc', 'stats', 'Power VDD_SOC', 'INT', 0),
+    Metric('power_tot', 'stats', 'Power TOT', 'INT', 0),
+    Metric('jetson_clocks', 'stats', 'jetson_clocks', 'VARCHAR(10)', 'OFF'),
+    Metric('nvp_model', 'stats', 'nvp model', 'VARCHAR(50)', 'UNKNOWN'),
+    Metric('disk_available_gb', 'sample', 'disk_available_gb', 'FLOAT', None),
+    Metric('hostname', 'device', 'hostname', 'VARCHAR(255)', None),
+    Metric('ip_address', 'device', 'ip_address', 'VARCHAR(50)', None),
+    Metric('model', 'device', 'model', 'TEXT', None),
+    Metric('jetpack', 'device', 'jetpack', 'TEXT', None),
+    Metric('l4t', 'device', 'l4t', 'TEXT', None),
+    Metric('nv_power_mode', 'device', 'nv_power_mode', 'TEXT', None),
+    Metric('serial_number', 'device', 'serial_number', 'TEXT', None),
+    Metric('p_number', 'device', 'p_number', 'TEXT', None),
+    Metric('module', 'device', 'module', 'TEXT', None),
+    Metric('distribution', 'device', 'distribution', 'TEXT', None),
+    Metric('cuda', 'device', 'cuda', 'TEXT', None),
+    Metric('cudnn', 'device', 'cudnn', 'TEXT', None),
+    Metric('tensorrt', 'stats', 'tensorrt', 'TEXT', ''),
+    Metric('vpi', 'stats', 'vpi', 'TEXT', ''),
+    Metric('vulkan', 'stats', 'vulkan', 'TEXT', ''),
+    Metric('opencv', 'stats', 'opencv', 'TEXT', ''),
+    Metric('sample_interval', 'sample', 'sample_interval', 'FLOAT', None),
+    Metric('boot_id', 'sample', 'boot_id', 'CHAR(36)', None),
+    Metric('seq', 'sample', 'seq', 'BIGINT', None),
+    Metric('energy_vdd_cpu_gpu_cv_mj', 'sample', 'energy_vdd_cpu_gpu_cv_mj', 'DOUBLE', None),
+    Metric('energy_vdd_cpu_gpu_cv_interval_mj', 'sample', 'energy_vdd_cpu_gpu_cv_interval_mj', 'DOUBLE', None),
+    Metric('energy_vdd_soc_mj', 'sample', 'energy_vdd_soc_mj', 'DOUBLE', None),
+    Metric('energy_vdd_soc_interval_mj', 'sample', 'energy_vdd_soc_interval_mj', 'DOUBLE', None),
+    Metric('energy_tot_mj', 'sample', 'energy_tot_mj', 'DOUBLE', None),
+    Metric('energy_tot_interval_mj', 'sample', 'energy_tot_interval_mj', 'DOUBLE', None),
+]
+
+COLUMNS = tuple(m.column for m in METRICS)
+COLUMN_TYPES = {m.column: m.sql_type for m in METRICS}
+
+
+def table_ddl(metrics=METRICS):
+    return ",\n".join(["id INT AUTO_INCREMENT PRIMARY KEY"] + [f"`{m.column}` {m.sql_type}" for m in metrics])
+
+
+def insert_query(table_name, metrics=METRICS, idempotent=False):
+    columns = ", ".join(f"`{m.column}`" for m in metrics)
+    placeholders = ", ".join(["%s"] * len(metrics))
+    query = f"INSERT INTO `{table_name}` ({columns}) VALUES ({placeholders})"
+    if idempotent:
+        # a retried row that already landed hits the unique key and affects 0 rows
+        query += " ON DUPLICATE KEY UPDATE `id` = `id`"
+    return query
+
+
+def format_uptime(value):
+    # same text mysql-connector produced for the timedelta jtop reports, so
+    # rows stay comparable with the ones written before the registry
+    if value is None or isinstance(value, str):
+        return value
+    seconds = abs(value.days * 86400 + value.seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    text = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+    if value.microseconds:
+        text += f".{value.microseconds:06d}"
+    return f"-{text}" if value.days < 0 else text
+
+
+def make_row_builder(metrics=METRICS):
+    # Compiles `lambda stats, device, sample: (stats.get('CPU1', 0), ...)` once,
+    # so building a row is a single tuple display with no per-key Python loop.
+    fields = []
+    for m in metrics:
+        getter = f"{m.source}.get({m.key!r}, {m.default!r})"
+        fields.append(f"format_uptime({getter})" if m.column == 'uptime' else getter)
+    source = f"lambda stats, device, sample: ({', '.join(fields)},)"
+    return eval(compile(source, '<metric row builder>', 'eval'), {'format_uptime': format_uptime})
+
+
+def synthetic_stats(rng):
+    # plausible random readings for the load test and the wire format round trip
+    stats = {}
+    for m in METRICS:
+        if m.source != 'stats':
+            continue
+        if m.sql_type == 'INT':
+            stats[m.key] = rng.randint(0, 100) if m.key.startswith(('CPU', 'GPU', 'EMC', 'SWAP')) else rng.randint(0, 20000)
+        elif m.sql_type == 'FLOAT':
+            stats[m.key] = round(rng.uniform(30, 90), 2)
+        else:
+            stats[m.key] = m.default
+    stats['uptime'] = f"{rng.randint(0, 999):02d}:00:00"
+    return stats
+
+
+def synthetic_device(name):
+    device = {m.key: f"sim {m.key}" for m in METRICS if m.source == 'device'}
+    device.update(hostname=name, ip_address='127.0.0.1', model='Simulated Orin')
+    return device
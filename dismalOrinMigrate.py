@@ -0,0 +1,169 @@
+import re
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import mysql.connector
+from mysql.connector import Error
+from dismalOrinGather import read_db_config, read_config, create_table_if_missing
+
+CHECKPOINT_TABLE = 'migration_checkpoints'
+NUMERIC_TYPES = ('int', 'bigint', 'float', 'double', 'decimal')
+
+
+def create_checkpoint_table(cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS `{CHECKPOINT_TABLE}` (
+            source_table VARCHAR(255) PRIMARY KEY,
+            target_table VARCHAR(255),
+            layout VARCHAR(10),
+            last_id BIGINT NOT NULL,
+            rows_copied BIGINT NOT NULL DEFAULT 0,
+            updated DATETIME
+        );
+    """)
+
+
+def current_column_name(legacy_name):
+    # `Temp CPU` -> temp_cpu, `nvp model` -> nvp_model, CPU1 -> cpu1
+    return re.sub(r'[^a-z0-9]+', '_', legacy_name.lower()).strip('_')
+
+
+def show_columns(cursor, database, table_name):
+    cursor.execute(f"SHOW COLUMNS FROM `{database}`.`{table_name}`")
+    return [(row[0], row[1].decode() if isinstance(row[1], bytes) else row[1]) for row in cursor.fetchall()]
+
+
+def detect_layout(columns):
+    names = [name for name, _ in columns]
+    types = [column_type.lower() for name, column_type in columns if name != 'id']
+    if 'time' not in names:
+        return None
+    if types and all(t == 'varchar(255)' for t in types):
+        return 'v1'
+    if 'CPU1' in names or 'Temp CPU' in names or 'nvp model' in names:
+        return 'v4' if 'disk_available_gb' in names else 'v3'
+    if 'cpu1' in names:
+        return 'current'
+    return None
+
+
+def convert(value, target_type):
+    if value is None or not target_type.startswith(NUMERIC_TYPES):
+        return value
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if target_type.startswith(('int', 'bigint')) else number
+
+
+def list_legacy_tables(cursor, database, target_suffix='_legacy'):
+    cursor.execute(f"SHOW TABLES FROM `{database}`")
+    tables = [row[0] for row in cursor.fetchall()]
+    table_set = set(tables)
+    # V4 kept a trimmed copy next to <host>_storage; only the storage table has history
+    return [t for t in tables if t != CHECKPOINT_TABLE and f"{t}_storage" not in table_set
+            and not t.endswith(target_suffix)]
+
+
+def migrate_table(db_config, source_database, source_table, chunk_size, target_suffix='_legacy'):
+    host = source_table[:-len('_storage')] if source_table.endswith('_storage') else source_table
+    # not <host>_storage: rows copied now would get ids above the live ones, and
+    # the query, report and archive tools rely on ids growing with time
+    target_table = f"{host}{target_suffix}"
+    # autocommit reads: InnoDB serves each one from a fresh snapshot without
+    # locking the source, and no snapshot is held open across the whole copy
+    source = mysql.connector.connect(**{**db_config, 'database': source_database, 'autocommit': True})
+    target = mysql.connector.connect(**db_config)
+    try:
+        source_cursor = source.cursor()
+        target_cursor = target.cursor(buffered=True)
+
+        source_columns = show_columns(source_cursor, source_database, source_table)
+        layout = detect_layout(source_columns)
+        if layout is None or (layout == 'current' and source_database == db_config['database']):
+            print(f"Skipping `{source_database}`.`{source_table}`: not a legacy collector table")
+            return source_table, 0
+
+        create_table_if_missing(target_cursor, target_table)
+        target_types = dict(show_columns(target_cursor, db_config['database'], target_table))
+        mapping = []
+        for name, _ in source_columns:
+            target_name = current_column_name(name)
+            if name != 'id' and target_name in target_types:
+                mapping.append((name, target_name, target_types[target_name].lower()))
+        fill_hostname = 'hostname' not in [m[1] for m in mapping]
+
+        target_cursor.execute(f"SELECT last_id, rows_copied FROM `{CHECKPOINT_TABLE}` WHERE source_table = %s",
+                              (f"{source_database}.{source_table}",))
+        row = target_cursor.fetchone()
+        last_id, copied = row if row else (0, 0)
+
+        select = ", ".join(f"`{name}`" for name, _, _ in mapping)
+        columns = [target_name for _, target_name, _ in mapping] + (['hostname'] if fill_hostname else [])
+        insert = (f"INSERT INTO `{target_table}` ({', '.join(f'`{c}`' for c in columns)}) "
+                  f"VALUES ({', '.join(['%s'] * len(columns))})")
+        checkpoint = (f"INSERT INTO `{CHECKPOINT_TABLE}` (source_table, target_table, layout, last_id, rows_copied, updated) "
+                      f"VALUES (%s, %s, %s, %s, %s, UTC_TIMESTAMP()) ON DUPLICATE KEY UPDATE "
+                      f"last_id = VALUES(last_id), rows_copied = VALUES(rows_copied), updated = VALUES(updated)")
+
+        print(f"Migrating `{source_database}`.`{source_table}` ({layout}) -> `{target_table}` from id {last_id}")
+        while True:
+            source_cursor.execute(f"SELECT id, {select} FROM `{source_table}` WHERE id > %s ORDER BY id LIMIT %s",
+                                  (last_id, chunk_size))
+            rows = source_cursor.fetchall()
+            if not rows:
+                break
+            values = []
+            for row in rows:
+                converted = [convert(v, mapping[i][2]) for i, v in enumerate(row[1:])]
+                values.append(converted + [host] if fill_hostname else converted)
+            # executemany rewrites single-row INSERTs into one multi-row statement
+            target_cursor.executemany(insert, values)
+            last_id = rows[-1][0]
+            copied += len(rows)
+            target_cursor.execute(checkpoint, (f"{source_database}.{source_table}", target_table, layout, last_id, copied))
+            target.commit()
+            if len(rows) < chunk_size:
+                break
+        print(f"Migrated {copied} rows from `{source_database}`.`{source_table}`")
+        return source_table, copied
+    finally:
+        source.close()
+        target.close()
+
+
+def main():
+    migrate_config = read_config('migrate')
+    parser = argparse.ArgumentParser(description='Backfill legacy V1-V4 per-host tables into <hostname>_legacy')
+    parser.add_argument('--source-database', default=migrate_config.get('source_database', 'sfOrinMonitoring'))
+    parser.add_argument('--table', action='append', help='legacy table to migrate (default: all)')
+    parser.add_argument('--target-suffix', default=migrate_config.get('target_suffix', '_legacy'),
+                        help='migrated rows go to <hostname><suffix>')
+    parser.add_argument('--chunk-size', type=int, default=int(migrate_config.get('chunk_size', 5000)))
+    parser.add_argument('--workers', type=int, default=int(migrate_config.get('workers', 4)))
+    args = parser.parse_args()
+
+    db_config = read_db_config()
+    try:
+        connection = mysql.connector.connect(**db_config)
+        cursor = connection.cursor()
+        create_checkpoint_table(cursor)
+        connection.commit()
+        tables = args.table or list_legacy_tables(cursor, args.source_database, args.target_suffix)
+        connection.close()
+    except Error as e:
+        print(f"MySQL Error: {e}")
+        return
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(migrate_table, db_config, args.source_database, t, args.chunk_size,
+                               args.target_suffix): t for t in tables}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Error as e:
+                print(f"MySQL Error migrating `{futures[future]}`: {e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+import time
+import socket
+import psutil
+from mysql.connector import Error
+
+NETWORK_TABLE = 'net_samples'
+SKIP_INTERFACES = ('lo',)
+
+
+def create_network_table(cursor):
+    try:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS `{NETWORK_TABLE}` (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                time DATETIME,
+                hostname VARCHAR(255),
+                interface VARCHAR(32),
+                rx_bps FLOAT,
+                tx_bps FLOAT,
+                rx_pps FLOAT,
+                tx_pps FLOAT,
+                drops_in INT,
+                drops_out INT,
+                errors_in INT,
+                errors_out INT,
+                INDEX idx_host_time (hostname, time)
+            );
+        """)
+    except Error as e:
+        print(f"Error creating table `{NETWORK_TABLE}`: {e}")
+
+
+def detect_ip_address(target_host):
+    # connect() on a UDP socket only picks the outgoing route, nothing is sent
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect((target_host, 9))
+            return s.getsockname()[0]
+    except OSError:
+        try:
+            return socket.gethostbyname(socket.gethostname())
+        except OSError:
+            return None
+
+
+class NetworkCollector:
+    def __init__(self, target_host, ip_check_interval=60):
+        self.target_host = target_host
+        self.ip_check_interval = ip_check_interval
+        self.prev_counters = None
+        self.prev_wall = None
+        self.ip_address = None
+        self.ip_checked = None
+
+    def check_ip(self):
+        now = time.monotonic()
+        if self.ip_checked is not None and now - self.ip_checked < self.ip_check_interval:
+            return self.ip_address
+        self.ip_checked = now
+        ip_address = detect_ip_address(self.target_host)
+        if ip_address and ip_address != self.ip_address:
+            if self.ip_address is not None:
+                print(f"IP address changed from {self.ip_address} to {ip_address}")
+            self.ip_address = ip_address
+        return self.ip_address
+
+    def collect(self):
+        now = time.monotonic()
+        counters = psutil.net_io_counters(pernic=True) or {}
+        elapsed = now - self.prev_wall if self.prev_wall else None
+        prev_counters = self.prev_counters or {}
+        self.prev_counters = counters
+        self.prev_wall = now
+        if not elapsed:
+            return []
+
+        rows = []
+        for interface, io in counters.items():
+            prev = prev_counters.get(interface)
+            if interface in SKIP_INTERFACES or prev is None:
+                continue
+            rows.append((
+                interface,
+                (io.bytes_recv - prev.bytes_recv) / elapsed,
+                (io.bytes_sent - prev.bytes_sent) / elapsed,
+                (io.packets_recv - prev.packets_recv) / elapsed,
+                (io.packets_sent - prev.packets_sent) / elapsed,
+                io.dropin - prev.dropin,
+                io.dropout - prev.dropout,
+                io.errin - prev.errin,
+                io.errout - prev.errout,
+            ))
+        return rows
+
+
+def insert_network_samples(cursor, timestamp, hostname, rows):
+    query = (f"INSERT INTO `{NETWORK_TABLE}` (time, hostname, interface, rx_bps, tx_bps, rx_pps, tx_pps, "
+             f"drops_in, drops_out, errors_in, errors_out) "
+             f"VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)")
+    try:
+        cursor.executemany(query, [(timestamp, hostname) + row for row in rows])
+    except Error as e:
+        print(f"MySQL Error inserting into {NETWORK_TABLE}: {e}")
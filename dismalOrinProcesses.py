@@ -0,0 +1,70 @@
+import time
+import psutil
+from mysql.connector import Error
+
+PROCESS_TABLE = 'process_samples'
+PROCESS_ATTRS = ['pid', 'name', 'cpu_times', 'memory_info']
+
+
+def create_process_table(cursor):
+    try:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS `{PROCESS_TABLE}` (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                time DATETIME,
+                hostname VARCHAR(255),
+                pid INT,
+                name VARCHAR(255),
+                cpu_percent FLOAT,
+                rss_mb FLOAT,
+                gpu_mem_mb FLOAT,
+                INDEX idx_host_time (hostname, time)
+            );
+        """)
+    except Error as e:
+        print(f"Error creating table `{PROCESS_TABLE}`: {e}")
+
+
+class ProcessCollector:
+    def __init__(self, top_n=10):
+        self.top_n = top_n
+        self.prev_times = {}
+        self.prev_wall = None
+
+    def collect(self, gpu_processes=None):
+        now = time.monotonic()
+        elapsed = now - self.prev_wall if self.prev_wall else None
+        self.prev_wall = now
+
+        # jtop process rows: [pid, user, gpu, type, priority, state, cpu, mem, gpu_mem, name]
+        gpu_mem = {row[0]: row[8] / 1024.0 for row in gpu_processes or [] if len(row) > 8}
+
+        rows = []
+        times = {}
+        for proc in psutil.process_iter(PROCESS_ATTRS):
+            info = proc.info
+            cpu_times = info['cpu_times']
+            memory = info['memory_info']
+            if cpu_times is None or memory is None:
+                continue
+            pid = info['pid']
+            total = cpu_times.user + cpu_times.system
+            times[pid] = total
+            prev = self.prev_times.get(pid)
+            cpu_percent = 100.0 * (total - prev) / elapsed if elapsed and prev is not None else 0.0
+            rows.append((pid, info['name'], cpu_percent, memory.rss / (1024 ** 2), gpu_mem.get(pid, 0.0)))
+        self.prev_times = times
+
+        by_cpu = sorted(rows, key=lambda r: r[2], reverse=True)[:self.top_n]
+        by_mem = sorted(rows, key=lambda r: r[3], reverse=True)[:self.top_n]
+        by_gpu = [r for r in rows if r[4] > 0]
+        return list({r[0]: r for r in by_cpu + by_mem + by_gpu}.values())
+
+
+def insert_process_samples(cursor, timestamp, hostname, rows):
+    query = (f"INSERT INTO `{PROCESS_TABLE}` (time, hostname, pid, name, cpu_percent, rss_mb, gpu_mem_mb) "
+             f"VALUES (%s, %s, %s, %s, %s, %s, %s)")
+    try:
+        cursor.executemany(query, [(timestamp, hostname) + row for row in rows])
+    except Error as e:
+        print(f"MySQL Error inserting into {PROCESS_TABLE}: {e}")
@@ -0,0 +1,137 @@
+import re
+import sys
+import time
+import argparse
+from datetime import datetime
+import numpy as np
+import mysql.connector
+from mysql.connector import Error
+from dismalOrinGather import read_db_config, read_config
+from dismalOrinDashboards import load_panel_queries, retarget_query, expand_macros, parse_grafana_time
+
+HANDLER_READS = ('Handler_read_first', 'Handler_read_key', 'Handler_read_last', 'Handler_read_next',
+                 'Handler_read_prev', 'Handler_read_rnd', 'Handler_read_rnd_next')
+LIMIT_WITHOUT_ORDER = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+ORDER_BY = re.compile(r'\bORDER\s+BY\b', re.IGNORECASE)
+FILTERED = re.compile(r'\b(WHERE|ORDER\s+BY|GROUP\s+BY)\b', re.IGNORECASE)
+
+
+def rows_read(cursor):
+    cursor.execute(f"SHOW SESSION STATUS WHERE Variable_name IN ({', '.join(['%s'] * len(HANDLER_READS))})",
+                   HANDLER_READS)
+    return sum(int(value) for _, value in cursor.fetchall())
+
+
+def explain(cursor, sql):
+    cursor.execute(f"EXPLAIN {sql}")
+    names = [d[0].lower() for d in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+def flags_for(sql, plan):
+    flags = []
+    if LIMIT_WITHOUT_ORDER.search(sql) and not ORDER_BY.search(sql):
+        flags.append('limit without order by')
+    for step in plan:
+        extra = step.get('extra') or ''
+        table = step.get('table') or '?'
+        if isinstance(extra, bytes):
+            extra = extra.decode()
+        if step.get('type') == 'ALL':
+            flags.append(f'full scan of {table}')
+            if not step.get('possible_keys') and FILTERED.search(sql):
+                flags.append(f'no usable index on {table}')
+        if 'Using filesort' in extra:
+            flags.append(f'filesort on {table}')
+        if 'Using temporary' in extra:
+            flags.append(f'temporary table for {table}')
+    return flags
+
+
+def profile(connection, sql, runs):
+    cursor = connection.cursor(buffered=True)
+    plan = explain(cursor, sql)
+    estimated = 1
+    for step in plan:
+        estimated *= int(step.get('rows') or 1)
+    timings, read = [], 0
+    for _ in range(runs):
+        before = rows_read(cursor)
+        started = time.perf_counter()
+        cursor.execute(sql)
+        returned = len(cursor.fetchall())
+        timings.append((time.perf_counter() - started) * 1000.0)
+        read = rows_read(cursor) - before
+    cursor.close()
+    return plan, estimated, read, returned, float(np.median(timings))
+
+
+def main():
+    profile_config = read_config('profile')
+    parser = argparse.ArgumentParser(description='EXPLAIN and time every panel query in the shipped dashboards')
+    parser.add_argument('--dashboards', default=profile_config.get('dashboards', 'dashboardItems/*.json'))
+    parser.add_argument('--host', help='run the panels against <host> in the configured database '
+                                       '(default: the tables the dashboards name)')
+    parser.add_argument('--from', dest='start', default=profile_config.get('from', 'now-6h'))
+    parser.add_argument('--to', dest='end', default=profile_config.get('to', 'now'))
+    parser.add_argument('--interval', type=float, default=float(profile_config.get('interval', 60)),
+                        help='seconds substituted for $__interval')
+    parser.add_argument('--var', action='append', default=[], help='template variable as name=value')
+    parser.add_argument('--runs', type=int, default=int(profile_config.get('runs', 5)))
+    parser.add_argument('--viewers', type=int, default=int(profile_config.get('viewers', 1)),
+                        help='open dashboards assumed when estimating load per refresh')
+    parser.add_argument('--strict', action='store_true', help='exit 1 if any panel is flagged')
+    args = parser.parse_args()
+
+    now = datetime.utcnow()
+    start, end = parse_grafana_time(args.start, now), parse_grafana_time(args.end, now)
+    variables = dict(v.split('=', 1) for v in args.var)
+    db_config = read_db_config()
+
+    # identical SQL in several dashboards is profiled once and charged for every panel
+    panels = {}
+    for path, dashboard, title, sql, refresh in load_panel_queries(args.dashboards):
+        if args.host:
+            sql = retarget_query(sql, args.host)
+        sql = expand_macros(sql, start, end, args.interval, variables)
+        panels.setdefault(sql, []).append((dashboard, title, refresh))
+
+    try:
+        connection = mysql.connector.connect(**db_config)
+    except Error as e:
+        print(f"MySQL Error: {e}")
+        return 1
+    flagged = 0
+    load = 0.0
+    try:
+        for sql, uses in panels.items():
+            names = ", ".join(f"{dashboard} / {title}" for dashboard, title, _ in uses)
+            print(f"\n{names}\n  {sql}")
+            try:
+                plan, estimated, read, returned, median_ms = profile(connection, sql, args.runs)
+            except Error as e:
+                print(f"  MySQL Error: {e}")
+                flagged += 1
+                continue
+            for step in plan:
+                print(f"  plan: table={step.get('table')} type={step.get('type')} key={step.get('key')} "
+                      f"rows={step.get('rows')} extra={step.get('extra')}")
+            per_second = sum(1.0 / refresh for _, _, refresh in uses) * args.viewers
+            load += median_ms * per_second
+            print(f"  {median_ms:.2f} ms median over {args.runs} runs, {returned} rows returned, {read} rows read "
+                  f"(estimated {estimated}); {per_second:.2f} executions/s -> {median_ms * per_second:.1f} ms of "
+                  f"database time and {read * per_second:.0f} rows read per second")
+            flags = flags_for(sql, plan)
+            if flags:
+                flagged += 1
+                print(f"  FLAGGED: {', '.join(flags)}")
+    finally:
+        connection.close()
+
+    print(f"\n{len(panels)} distinct panel queries, {flagged} flagged; "
+          f"{load:.1f} ms of database time per second with {args.viewers} viewer(s)")
+    return 1 if args.strict and flagged else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
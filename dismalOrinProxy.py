@@ -0,0 +1,227 @@
+import re
+import json
+import time
+import argparse
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone, date
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from mysql.connector import Error
+from mysql.connector.pooling import MySQLConnectionPool
+from dismalOrinGather import read_db_config, read_config
+from dismalOrinDashboards import load_panel_queries, retarget_query, expand_macros
+
+WHITESPACE = re.compile(r'\s+')
+HOST_PATTERN = re.compile(r'^[A-Za-z0-9_.-]+$')
+
+
+def normalize(sql):
+    return WHITESPACE.sub(' ', sql).strip().rstrip(';').strip()
+
+
+def parse_range_time(text):
+    # Grafana sends ISO 8601 in UTC, e.g. 2024-01-01T00:00:00.000Z
+    return datetime.fromisoformat(text.replace('Z', '+00:00')).replace(tzinfo=None)
+
+
+def json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, timedelta):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode(errors='replace')
+    return value
+
+
+class QueryCache:
+    # TTL cache with request coalescing: the first caller for a key runs the
+    # query, callers arriving while it is in flight wait for that result instead
+    # of sending their own, and everyone inside the TTL gets the cached copy.
+    def __init__(self, pool, ttl=1.0, max_entries=1000):
+        self.pool = pool
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        # the pool raises instead of blocking when it is empty, so queue for a slot here
+        self.slots = threading.BoundedSemaphore(pool.pool_size)
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0}
+
+    def get(self, sql):
+        key = normalize(sql)
+        leader = False
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[1]
+            waiter = self.in_flight.get(key)
+            if waiter:
+                self.stats['coalesced'] += 1
+            else:
+                waiter = self.in_flight[key] = {'done': threading.Event(), 'result': None, 'error': None}
+                self.stats['misses'] += 1
+                leader = True
+        if not leader:
+            waiter['done'].wait()
+            if waiter['error']:
+                raise waiter['error']
+            return waiter['result']
+
+        try:
+            waiter['result'] = self.run(key)
+        except Exception as e:
+            waiter['error'] = e
+            with self.lock:
+                self.stats['errors'] += 1
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+                if waiter['error'] is None:
+                    self.entries[key] = (time.monotonic() + self.ttl, waiter['result'])
+                    self.entries.move_to_end(key)
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+            waiter['done'].set()
+        return waiter['result']
+
+    def run(self, sql):
+        with self.slots:
+            return self.run_pooled(sql)
+
+    def run_pooled(self, sql):
+        connection = self.pool.get_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(sql)
+            columns = [d[0] for d in cursor.description or []]
+            rows = [[json_value(v) for v in row] for row in cursor.fetchall()]
+            cursor.close()
+            return columns, rows
+        finally:
+            connection.close()  # returns it to the pool
+
+
+class Datasource:
+    # Grafana JSON datasource API over the shipped panel queries. A target is a
+    # panel title, optionally prefixed with `<host>:` (or given payload.host) to
+    # run it against that host's table; arbitrary SQL is never accepted.
+    def __init__(self, cache, panels, bucket):
+        self.cache = cache
+        self.panels = panels
+        self.bucket = bucket
+
+    def search(self):
+        return sorted(self.panels)
+
+    def bucketed(self, when):
+        # queries inside one bucket expand to the same SQL and share a cache entry
+        seconds = when.replace(tzinfo=timezone.utc).timestamp() // self.bucket * self.bucket
+        return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+
+    def query(self, request):
+        time_range = request.get('range') or {}
+        end = parse_range_time(time_range['to']) if time_range.get('to') else datetime.utcnow()
+        start = parse_range_time(time_range['from']) if time_range.get('from') else end - timedelta(hours=1)
+        start, end = self.bucketed(start), self.bucketed(end)
+        interval = max(1.0, float(request.get('intervalMs') or 1000) / 1000.0)
+        results = []
+        for target in request.get('targets', []):
+            name = target.get('target') or ''
+            host = (target.get('payload') or {}).get('host')
+            if name not in self.panels and ':' in name:
+                host, name = name.split(':', 1)
+            sql = self.panels.get(name)
+            if sql is None:
+                raise KeyError(f"Unknown panel {name!r}")
+            if host:
+                if not HOST_PATTERN.match(host):
+                    raise ValueError(f"Invalid host {host!r}")
+                sql = retarget_query(sql, host)
+            columns, rows = self.cache.get(expand_macros(sql, start, end, interval))
+            results.append({'type': 'table', 'refId': target.get('refId'),
+                            'columns': [{'text': c} for c in columns], 'rows': rows})
+        return results
+
+
+def make_handler(datasource):
+    class Handler(BaseHTTPRequestHandler):
+        def send_json(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/':
+                self.send_json(200, {'status': 'ok'})
+            elif self.path == '/stats':
+                self.send_json(200, dict(datasource.cache.stats, cached=len(datasource.cache.entries)))
+            else:
+                self.send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                request = json.loads(self.rfile.read(length) or b'{}')
+                if self.path in ('/search', '/metrics'):
+                    self.send_json(200, datasource.search())
+                elif self.path == '/query':
+                    self.send_json(200, datasource.query(request))
+                elif self.path == '/annotations':
+                    self.send_json(200, [])
+                else:
+                    self.send_json(404, {'error': 'not found'})
+            except (ValueError, KeyError) as e:
+                self.send_json(400, {'error': str(e)})
+            except Error as e:
+                self.send_json(502, {'error': f"MySQL Error: {e}"})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    proxy_config = read_config('proxy')
+    parser = argparse.ArgumentParser(description='Caching Grafana JSON datasource for the dashboard panel queries')
+    parser.add_argument('--bind', default=proxy_config.get('bind', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(proxy_config.get('port', 3003)))
+    parser.add_argument('--ttl', type=float, default=float(proxy_config.get('ttl', 1)))
+    parser.add_argument('--pool-size', type=int, default=int(proxy_config.get('pool_size', 4)))
+    parser.add_argument('--max-entries', type=int, default=int(proxy_config.get('max_entries', 1000)))
+    parser.add_argument('--dashboards', default=proxy_config.get('dashboards', 'dashboardItems/*.json'))
+    args = parser.parse_args()
+
+    panels = {}
+    for _, _, title, sql, _ in load_panel_queries(args.dashboards):
+        panels.setdefault(title or sql, sql)
+    try:
+        pool = MySQLConnectionPool(pool_name='orin_proxy', pool_size=args.pool_size, **read_db_config())
+    except Error as e:
+        print(f"MySQL Error: {e}")
+        return
+    cache = QueryCache(pool, args.ttl, args.max_entries)
+    datasource = Datasource(cache, panels, max(args.ttl, 1.0))
+    server = ThreadingHTTPServer((args.bind, args.port), make_handler(datasource))
+    print(f"Serving {len(panels)} panel queries on {args.bind}:{args.port} (ttl {args.ttl}s, pool {args.pool_size})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
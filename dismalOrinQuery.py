@@ -0,0 +1,237 @@
+import os
+import re
+import sys
+import csv
+import glob
+import json
+import argparse
+from datetime import datetime, timedelta
+import numpy as np
+import mysql.connector
+from dismalOrinGather import read_db_config
+from dismalOrinArchive import list_storage_tables, pyarrow
+
+COLUMN_PATTERN = re.compile(r'^[A-Za-z0-9_]+$')
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def parse_duration(text):
+    return timedelta(seconds=float(text[:-1]) * DURATION_UNITS[text[-1]])
+
+
+def find_id_at(cursor, table_name, when):
+    # ids grow with time, so a binary search over primary key lookups finds the
+    # first row at or after `when` without a full scan of the unindexed time column
+    cursor.execute(f"SELECT MIN(id), MAX(id) FROM `{table_name}`")
+    low, high = cursor.fetchone()
+    if low is None:
+        return None
+    while low < high:
+        mid = (low + high) // 2
+        cursor.execute(f"SELECT id, time FROM `{table_name}` WHERE id >= %s ORDER BY id LIMIT 1", (mid,))
+        row = cursor.fetchone()
+        if row[1] is not None and row[1] < when:
+            low = row[0] + 1
+        else:
+            high = mid
+    cursor.execute(f"SELECT id, time FROM `{table_name}` WHERE id >= %s ORDER BY id LIMIT 1", (low,))
+    row = cursor.fetchone()
+    if row and row[1] is not None and row[1] < when:
+        return row[0] + 1  # every row is older than `when`
+    return low
+
+
+def load_mysql(connection, host, columns, start, end, chunk_size):
+    table_name = f"{host}_storage"
+    cursor = connection.cursor(buffered=True)
+    last_id = find_id_at(cursor, table_name, start)
+    times, values = [], [[] for _ in columns]
+    if last_id is None:
+        return np.array([], dtype='datetime64[s]'), [np.array([]) for _ in columns]
+    last_id -= 1
+    select = ", ".join(f"`{c}`" for c in columns)
+    while True:
+        cursor.execute(f"SELECT id, time, {select} FROM `{table_name}` WHERE id > %s ORDER BY id LIMIT %s",
+                       (last_id, chunk_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        past_end = rows[-1][1] is not None and rows[-1][1] >= end
+        fetched = len(rows)
+        rows = [row for row in rows if row[1] is not None and start <= row[1] < end]
+        if rows:
+            times.append(np.array([row[1] for row in rows], dtype='datetime64[s]'))
+            for i in range(len(columns)):
+                values[i].append(np.array([np.nan if row[2 + i] is None else float(row[2 + i]) for row in rows]))
+        if past_end or fetched < chunk_size:
+            break
+    cursor.close()
+    return concat_times(times), [concat_values(v) for v in values]
+
+
+def read_part(path, columns):
+    # archive parts are .npz or, with `format = parquet`, .parquet (needs pyarrow)
+    if path.endswith('.npz'):
+        with np.load(path) as part:
+            return {name: part[name] for name in ['time'] + columns}
+    if pyarrow is None:
+        raise SystemExit(f"{path} is a parquet archive part; install pyarrow to read it")
+    table = pyarrow.parquet.read_table(path, columns=['time'] + columns)
+    part = {name: table.column(name).to_numpy() for name in columns}
+    part['time'] = table.column('time').to_numpy().astype('datetime64[s]')
+    return part
+
+
+def load_archive(directory, host, columns, start, end):
+    times, values = [], [[] for _ in columns]
+    day = start.date()
+    while day <= end.date():
+        day_dir = os.path.join(directory, host, day.isoformat())
+        for path in sorted(glob.glob(os.path.join(day_dir, '*.npz')) + glob.glob(os.path.join(day_dir, '*.parquet'))):
+            part = read_part(path, columns)
+            t = part['time']
+            mask = (t >= np.datetime64(start, 's')) & (t < np.datetime64(end, 's'))
+            if not mask.any():
+                continue
+            times.append(t[mask])
+            for i, column in enumerate(columns):
+                values[i].append(part[column][mask].astype(np.float64))
+        day += timedelta(days=1)
+    return concat_times(times), [concat_values(v) for v in values]
+
+
+def concat_times(parts):
+    return np.concatenate(parts) if parts else np.array([], dtype='datetime64[s]')
+
+
+def concat_values(parts):
+    return np.concatenate(parts) if parts else np.array([], dtype=np.float64)
+
+
+def summarize(times, values, percentiles):
+    valid = values[~np.isnan(values)]
+    row = {'count': int(valid.size)}
+    if valid.size:
+        row.update({'mean': float(valid.mean()), 'min': float(valid.min()), 'max': float(valid.max())})
+        for q, v in zip(percentiles, np.percentile(valid, percentiles)):
+            row[f'p{q:g}'] = float(v)
+    return [row]
+
+
+def resample(times, values, step):
+    if not times.size:
+        return []
+    seconds = times.astype(np.int64)
+    buckets = seconds - seconds % int(step.total_seconds())
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    clean = np.where(np.isnan(values), 0.0, values)
+    counts = np.add.reduceat(~np.isnan(values), starts)
+    sums = np.add.reduceat(clean, starts)
+    maxes = np.maximum.reduceat(np.where(np.isnan(values), -np.inf, values), starts)
+    mins = np.minimum.reduceat(np.where(np.isnan(values), np.inf, values), starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    rows = []
+    for i, start in enumerate(starts):
+        rows.append({'bucket': str(np.datetime64(int(buckets[start]), 's')), 'count': int(counts[i]),
+                     'mean': float(means[i]), 'min': float(mins[i]), 'max': float(maxes[i])})
+    return rows
+
+
+def histogram(times, values, bins):
+    valid = values[~np.isnan(values)]
+    if not valid.size:
+        return []
+    counts, edges = np.histogram(valid, bins=bins)
+    return [{'low': float(edges[i]), 'high': float(edges[i + 1]), 'count': int(c)} for i, c in enumerate(counts)]
+
+
+def output_fields(command, percentiles):
+    # the CSV header is fixed before the first row: a summary over an empty range
+    # has only a count, so it cannot be taken from whichever row comes first
+    if command == 'summary':
+        fields = ['count', 'mean', 'min', 'max'] + [f'p{q:g}' for q in percentiles]
+    elif command == 'resample':
+        fields = ['bucket', 'count', 'mean', 'min', 'max']
+    else:
+        fields = ['low', 'high', 'count']
+    return ['host', 'metric'] + fields
+
+
+class Output:
+    def __init__(self, file_format, fields, stream=sys.stdout):
+        self.file_format = file_format
+        self.fields = fields
+        self.stream = stream
+        self.writer = None
+
+    def write(self, row):
+        if self.file_format == 'json':
+            self.stream.write(json.dumps(row) + '\n')
+            return
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.stream, fieldnames=self.fields)
+            self.writer.writeheader()
+        self.writer.writerow(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vectorized history queries over storage tables or archives')
+    parser.add_argument('command', choices=['summary', 'resample', 'histogram'])
+    parser.add_argument('metrics', nargs='+', help='storage columns, e.g. temp_tj power_tot')
+    parser.add_argument('--host', action='append', help='hostname (default: every host)')
+    parser.add_argument('--source', choices=['mysql', 'archive'], default='mysql')
+    parser.add_argument('--archive-directory', default='archive')
+    parser.add_argument('--start', type=datetime.fromisoformat)
+    parser.add_argument('--end', type=datetime.fromisoformat)
+    parser.add_argument('--last', type=parse_duration, default=timedelta(days=1), help='e.g. 30d, 12h')
+    parser.add_argument('--every', type=parse_duration, default=timedelta(hours=1), help='resample step')
+    parser.add_argument('--percentiles', type=float, nargs='+', default=[50, 95, 99])
+    parser.add_argument('--bins', type=int, default=20)
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+    args = parser.parse_args()
+
+    for metric in args.metrics:
+        if not COLUMN_PATTERN.match(metric):
+            raise Exception(f'Invalid metric name {metric}')
+    end = args.end or datetime.utcnow()
+    start = args.start or end - args.last
+
+    connection = None
+    if args.source == 'mysql':
+        connection = mysql.connector.connect(**read_db_config())
+    hosts = args.host
+    if not hosts:
+        if connection:
+            cursor = connection.cursor()
+            hosts = [t[:-len('_storage')] for t in list_storage_tables(cursor)]
+            cursor.close()
+        else:
+            hosts = sorted(os.listdir(args.archive_directory))
+
+    output = Output(args.format, output_fields(args.command, args.percentiles))
+    try:
+        for host in hosts:
+            if connection:
+                times, columns = load_mysql(connection, host, args.metrics, start, end, args.chunk_size)
+            else:
+                times, columns = load_archive(args.archive_directory, host, args.metrics, start, end)
+            for metric, values in zip(args.metrics, columns):
+                if args.command == 'summary':
+                    rows = summarize(times, values, args.percentiles)
+                elif args.command == 'resample':
+                    rows = resample(times, values, args.every)
+                else:
+                    rows = histogram(times, values, args.bins)
+                for row in rows:
+                    output.write({'host': host, 'metric': metric, **row})
+            sys.stdout.flush()
+    finally:
+        if connection:
+            connection.close()
+
+
+if __name__ == '__main__':
+    main()
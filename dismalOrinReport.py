@@ -0,0 +1,198 @@
+import csv
+import html
+import argparse
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+import numpy as np
+import mysql.connector
+from mysql.connector import Error
+from dismalOrinGather import read_db_config, read_config
+from dismalOrinArchive import list_storage_tables
+from dismalOrinQuery import find_id_at
+
+PERIODS = {'day': timedelta(days=1), 'week': timedelta(weeks=1)}
+MJ_PER_WH = 3_600_000.0
+
+
+class HostSummary:
+    # Running sums over fixed-size chunks; nothing is kept per row once a chunk is
+    # folded in, so memory stays flat however long the range is.
+    def __init__(self, temps, threshold, max_gap):
+        self.temps = temps
+        self.threshold = threshold
+        self.max_gap = max_gap
+        self.samples = 0
+        self.covered = 0.0
+        self.above = 0.0
+        self.temp_sum = np.zeros(len(temps))
+        self.temp_count = np.zeros(len(temps))
+        self.temp_peak = np.full(len(temps), -np.inf)
+        self.energy_mj = 0.0
+        self.disk = np.zeros(5)  # n, sum t, sum y, sum t*t, sum t*y
+        self.first = None
+        self.last = None
+        self.prev_time = None
+        self.prev_power = None
+
+    def add(self, t, temps, power, energy, disk):
+        n = t.size
+        if not n:
+            return
+        self.samples += n
+        self.first = t[0] if self.first is None else self.first
+        self.last = t[-1]
+
+        # each row owns the gap to the previous row, capped so outages are not counted
+        prev = np.empty(n)
+        prev[0] = self.prev_time if self.prev_time is not None else t[0]
+        prev[1:] = t[:-1]
+        dt = t - prev
+        dt[dt > self.max_gap] = 0.0
+        self.covered += dt.sum()
+
+        valid = ~np.isnan(temps)
+        self.temp_sum += np.where(valid, temps, 0.0).sum(axis=0)
+        self.temp_count += valid.sum(axis=0)
+        self.temp_peak = np.maximum(self.temp_peak, np.where(valid, temps, -np.inf).max(axis=0))
+        hottest = np.where(valid, temps, -np.inf).max(axis=1)
+        self.above += dt[hottest > self.threshold].sum()
+
+        prev_power = np.empty(n)
+        prev_power[0] = self.prev_power if self.prev_power is not None else power[0]
+        prev_power[1:] = power[:-1]
+        trapezoid = np.nan_to_num((power + prev_power) * 0.5 * dt)
+        self.energy_mj += np.where(np.isnan(energy), trapezoid, energy).sum()
+
+        ok = ~np.isnan(disk)
+        days = t[ok] / 86400.0
+        self.disk += [ok.sum(), days.sum(), disk[ok].sum(), (days * days).sum(), (days * disk[ok]).sum()]
+
+        self.prev_time = t[-1]
+        self.prev_power = power[-1]
+
+    def result(self, host, start, end, error=''):
+        n, st, sy, stt, sty = self.disk
+        denominator = n * stt - st * st
+        row = {
+            'host': host,
+            'samples': self.samples,
+            'first': str(datetime.utcfromtimestamp(self.first)) if self.first is not None else '',
+            'last': str(datetime.utcfromtimestamp(self.last)) if self.last is not None else '',
+            'uptime_pct': round(100.0 * self.covered / (end - start).total_seconds(), 2),
+            'hours_above_threshold': round(self.above / 3600.0, 3),
+            'energy_wh': round(self.energy_mj / MJ_PER_WH, 3),
+            'disk_trend_gb_per_day': round((n * sty - st * sy) / denominator, 4) if n > 1 and denominator else '',
+        }
+        for i, name in enumerate(self.temps):
+            row[f'{name}_avg'] = round(self.temp_sum[i] / self.temp_count[i], 2) if self.temp_count[i] else ''
+            row[f'{name}_peak'] = round(self.temp_peak[i], 2) if self.temp_count[i] else ''
+        row['error'] = error
+        return row
+
+
+def summarize_host(job):
+    db_config, host, start, end, temps, threshold, max_gap, chunk_size = job
+    table_name = f"{host}_storage"
+    summary = HostSummary(temps, threshold, max_gap)
+    try:
+        connection = mysql.connector.connect(**db_config)
+    except Error as e:
+        print(f"MySQL Error summarizing {host}: {e}")
+        return summary.result(host, start, end, error=str(e))
+    try:
+        cursor = connection.cursor(buffered=True)
+        cursor.execute("SET time_zone = '+00:00'")  # stored times are UTC
+        cursor.execute(f"SHOW COLUMNS FROM `{table_name}`")
+        existing = {row[0] for row in cursor.fetchall()}
+        first_id = find_id_at(cursor, table_name, start)
+        end_id = find_id_at(cursor, table_name, end)
+        cursor.close()
+        if first_id is None:
+            return summary.result(host, start, end)
+
+        energy = 'energy_tot_interval_mj' if 'energy_tot_interval_mj' in existing else 'NULL'
+        columns = ", ".join([f"`{c}`" if c in existing else 'NULL' for c in temps])
+        # unbuffered cursor: rows are streamed from the server chunk by chunk
+        stream = connection.cursor()
+        stream.execute(f"SELECT UNIX_TIMESTAMP(time), power_tot, {energy}, disk_available_gb, {columns} "
+                       f"FROM `{table_name}` WHERE id >= %s AND id < %s AND time >= %s AND time < %s ORDER BY id",
+                       (first_id, end_id, start, end))
+        width = 4 + len(temps)
+        buffer = np.empty((chunk_size, width))
+        while True:
+            rows = stream.fetchmany(chunk_size)
+            if not rows:
+                break
+            n = len(rows)
+            buffer[:n] = [[np.nan if v is None else float(v) for v in row] for row in rows]
+            chunk = buffer[:n]
+            summary.add(chunk[:, 0], chunk[:, 4:], chunk[:, 1], chunk[:, 2], chunk[:, 3])
+        stream.close()
+    except Error as e:
+        print(f"MySQL Error summarizing {host}: {e}")
+        return HostSummary(temps, threshold, max_gap).result(host, start, end, error=str(e))
+    finally:
+        connection.close()
+    return summary.result(host, start, end)
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_html(path, rows, start, end):
+    header = "".join(f"<th>{html.escape(k)}</th>" for k in rows[0].keys())
+    body = "".join("<tr>" + "".join(f"<td>{html.escape(str(v))}</td>" for v in row.values()) + "</tr>" for row in rows)
+    with open(path, 'w') as f:
+        f.write(f"<html><head><meta charset=\"utf-8\"><title>Orin fleet report</title></head><body>"
+                f"<h1>Orin fleet report</h1><p>{start:%Y-%m-%d %H:%M} to {end:%Y-%m-%d %H:%M} UTC</p>"
+                f"<table border=\"1\" cellpadding=\"4\"><tr>{header}</tr>{body}</table></body></html>\n")
+
+
+def main():
+    report_config = read_config('report')
+    parser = argparse.ArgumentParser(description='Per-device daily/weekly summary report')
+    parser.add_argument('--period', choices=list(PERIODS), default='day')
+    parser.add_argument('--end', type=datetime.fromisoformat, help='UTC end of the range (default: now)')
+    parser.add_argument('--host', action='append', help='hostname (default: every host)')
+    parser.add_argument('--temps', nargs='+', default=report_config.get('temps', 'temp_tj temp_cpu temp_gpu').split())
+    parser.add_argument('--threshold', type=float, default=float(report_config.get('temp_threshold', 80)))
+    parser.add_argument('--max-gap', type=float, default=float(report_config.get('max_gap', 60)),
+                        help='seconds between samples still counted as up')
+    parser.add_argument('--chunk-size', type=int, default=int(report_config.get('chunk_size', 10000)))
+    parser.add_argument('--workers', type=int, default=int(report_config.get('workers', 4)))
+    parser.add_argument('--output', default=report_config.get('output', 'fleet_report'),
+                        help='path prefix for the .csv and .html files')
+    args = parser.parse_args()
+
+    end = args.end or datetime.utcnow()
+    start = end - PERIODS[args.period]
+    db_config = read_db_config()
+    hosts = args.host
+    if not hosts:
+        try:
+            connection = mysql.connector.connect(**db_config)
+            cursor = connection.cursor()
+            hosts = [t[:-len('_storage')] for t in list_storage_tables(cursor)]
+            connection.close()
+        except Error as e:
+            print(f"MySQL Error: {e}")
+            return
+
+    jobs = [(db_config, host, start, end, args.temps, args.threshold, args.max_gap, args.chunk_size) for host in hosts]
+    with Pool(args.workers) as pool:
+        rows = pool.map(summarize_host, jobs)
+    if not rows:
+        print("No hosts to report on")
+        return
+    rows.sort(key=lambda r: r['host'])
+    write_csv(f"{args.output}.csv", rows)
+    write_html(f"{args.output}.html", rows, start, end)
+    print(f"Wrote {len(rows)} hosts to {args.output}.csv and {args.output}.html")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+import math
+import struct
+import argparse
+from datetime import datetime, timezone
+import mysql.connector
+from mysql.connector import Error
+from dismalOrinWire import write_varint, read_varint, zigzag, unzigzag
+
+SKETCH_TABLE = 'metric_sketches'
+SKETCH_VERSION = 1
+HEADER = struct.Struct('<BdQddd')  # version, relative accuracy, count, min, max, sum
+
+
+def create_sketch_table(cursor):
+    try:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS `{SKETCH_TABLE}` (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                hostname VARCHAR(255) NOT NULL,
+                metric VARCHAR(64) NOT NULL,
+                window_start DATETIME NOT NULL,
+                window_seconds INT NOT NULL,
+                count INT NOT NULL,
+                min DOUBLE,
+                max DOUBLE,
+                sketch BLOB NOT NULL,
+                KEY idx_metric_window (metric, window_start),
+                KEY idx_host_metric_window (hostname, metric, window_start)
+            );
+        """)
+    except Error as e:
+        print(f"Error creating table `{SKETCH_TABLE}`: {e}")
+
+
+class DDSketch:
+    # Log-bucketed quantile sketch: every quantile it returns is within
+    # relative_accuracy of the true value, and two sketches built with the same
+    # accuracy merge exactly by adding bucket counts, so per-host windows can be
+    # combined into fleet-wide percentiles over any range.
+    def __init__(self, relative_accuracy=0.01, max_bins=2048):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_bins = max_bins
+        self.positive = {}
+        self.negative = {}
+        self.zero = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sum = 0.0
+
+    def key(self, value):
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value):
+        if value > 0:
+            k = self.key(value)
+            self.positive[k] = self.positive.get(k, 0) + 1
+        elif value < 0:
+            k = self.key(-value)
+            self.negative[k] = self.negative.get(k, 0) + 1
+        else:
+            self.zero += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self.positive) + len(self.negative) > self.max_bins:
+            self.collapse()
+
+    def collapse(self):
+        # fold the buckets nearest zero together; only the low tail loses accuracy
+        for bins in (self.negative, self.positive):
+            while bins and len(self.positive) + len(self.negative) > self.max_bins:
+                keys = sorted(bins)
+                if len(keys) < 2:
+                    break
+                bins[keys[1]] += bins.pop(keys[0])
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for mine, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for k, c in theirs.items():
+                mine[k] = mine.get(k, 0) + c
+        self.zero += other.zero
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(self.positive) + len(self.negative) > self.max_bins:
+            self.collapse()
+        return self
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for k in sorted(self.negative, reverse=True):
+            seen += self.negative[k]
+            if seen > rank:
+                return max(self.min, -self.value(k))
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for k in sorted(self.positive):
+            seen += self.positive[k]
+            if seen > rank:
+                return min(self.max, self.value(k))
+        return self.max
+
+    def to_bytes(self):
+        out = bytearray(HEADER.pack(SKETCH_VERSION, self.relative_accuracy, self.count, self.min, self.max, self.sum))
+        write_varint(out, self.zero)
+        for bins in (self.positive, self.negative):
+            write_varint(out, len(bins))
+            previous = 0
+            for k in sorted(bins):
+                write_varint(out, zigzag(k - previous))
+                write_varint(out, bins[k])
+                previous = k
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data, max_bins=2048):
+        version, accuracy, count, low, high, total = HEADER.unpack_from(data)
+        if version != SKETCH_VERSION:
+            raise ValueError(f"Unknown sketch version {version}")
+        sketch = cls(accuracy, max_bins)
+        sketch.count, sketch.min, sketch.max, sketch.sum = count, low, high, total
+        sketch.zero, pos = read_varint(data, HEADER.size)
+        for bins in (sketch.positive, sketch.negative):
+            n, pos = read_varint(data, pos)
+            k = 0
+            for _ in range(n):
+                delta, pos = read_varint(data, pos)
+                c, pos = read_varint(data, pos)
+                k += unzigzag(delta)
+                bins[k] = c
+        return sketch
+
+
+class SketchCollector:
+    # One sketch per metric per aligned window; a closed window comes back as
+    # rows for insert_sketches.
+    def __init__(self, metrics, window=300, relative_accuracy=0.01, max_bins=2048):
+        self.metrics = metrics
+        self.window = window
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.window_start = None
+        self.sketches = {}
+
+    def add(self, data, t):
+        rows = []
+        start = int(t // self.window * self.window)
+        if self.window_start is not None and start != self.window_start:
+            rows = self.flush()
+        self.window_start = start
+        for metric in self.metrics:
+            value = data.get(metric)
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            sketch = self.sketches.get(metric)
+            if sketch is None:
+                sketch = self.sketches[metric] = DDSketch(self.relative_accuracy, self.max_bins)
+            sketch.add(float(value))
+        return rows
+
+    def flush(self):
+        if self.window_start is None:
+            return []
+        start = datetime.fromtimestamp(self.window_start, timezone.utc).replace(tzinfo=None)
+        rows = [(metric, start, self.window, s.count, s.min, s.max, s.to_bytes())
+                for metric, s in self.sketches.items() if s.count]
+        self.sketches = {}
+        return rows
+
+
+def insert_sketches(cursor, hostname, rows):
+    if not rows:
+        return
+    query = (f"INSERT INTO `{SKETCH_TABLE}` (hostname, metric, window_start, window_seconds, count, min, max, sketch) "
+             f"VALUES (%s, %s, %s, %s, %s, %s, %s, %s)")
+    try:
+        cursor.executemany(query, [(hostname,) + row for row in rows])
+    except Error as e:
+        print(f"MySQL Error inserting into {SKETCH_TABLE}: {e}")
+
+
+def merge_sketches(cursor, metric, start, end, hosts=None):
+    # {hostname: DDSketch} for every window starting in [start, end); merging the
+    # values gives the fleet-wide sketch
+    query = f"SELECT hostname, sketch FROM `{SKETCH_TABLE}` WHERE metric = %s AND window_start >= %s AND window_start < %s"
+    params = [metric, start, end]
+    if hosts:
+        query += f" AND hostname IN ({', '.join(['%s'] * len(hosts))})"
+        params += hosts
+    cursor.execute(query, params)
+    merged = {}
+    for hostname, blob in cursor.fetchall():
+        sketch = DDSketch.from_bytes(bytes(blob))
+        if hostname in merged:
+            merged[hostname].merge(sketch)
+        else:
+            merged[hostname] = sketch
+    return merged
+
+
+def main():
+    from dismalOrinGather import read_db_config
+    from dismalOrinQuery import parse_duration
+    parser = argparse.ArgumentParser(description='Fleet-wide percentiles from merged per-window sketches')
+    parser.add_argument('metric')
+    parser.add_argument('--host', action='append', help='hostname (default: every host)')
+    parser.add_argument('--last', type=parse_duration, default=parse_duration('24h'), help='e.g. 1h, 7d')
+    parser.add_argument('--end', type=datetime.fromisoformat, help='UTC end of the range (default: now)')
+    parser.add_argument('--quantiles', type=float, nargs='+', default=[0.5, 0.95, 0.99])
+    parser.add_argument('--per-host', action='store_true', help='also print each host')
+    args = parser.parse_args()
+
+    end = args.end or datetime.utcnow()
+    start = end - args.last
+    try:
+        connection = mysql.connector.connect(**read_db_config())
+        cursor = connection.cursor()
+        merged = merge_sketches(cursor, args.metric, start, end, args.host)
+        connection.close()
+    except Error as e:
+        print(f"MySQL Error: {e}")
+        return
+
+    fleet = None
+    print("host\tcount\tmin\tmax\t" + "\t".join(f"p{q * 100:g}" for q in args.quantiles))
+    for hostname in sorted(merged):
+        sketch = merged[hostname]
+        if args.per_host:
+            print(f"{hostname}\t{sketch.count}\t{sketch.min:g}\t{sketch.max:g}\t" +
+                  "\t".join(f"{sketch.quantile(q):.2f}" for q in args.quantiles))
+        fleet = sketch if fleet is None else fleet.merge(sketch)
+    if fleet is None:
+        print(f"No sketches for {args.metric} between {start} and {end}")
+        return
+    print(f"fleet\t{fleet.count}\t{fleet.min:g}\t{fleet.max:g}\t" +
+          "\t".join(f"{fleet.quantile(q):.2f}" for q in args.quantiles))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+import re
+import json
+import time
+import argparse
+import threading
+import http.client
+from collections import deque
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dismalOrinMetrics import COLUMNS
+from dismalOrinWire import encode_batch, decode_batch
+
+WIRE_TYPE = 'application/x-orin-wire'
+STREAM_PATH = re.compile(r'^/stream(?:/([A-Za-z0-9_.-]+))?/?$')
+LATEST_PATH = re.compile(r'^/latest/([A-Za-z0-9_.-]+)/?$')
+
+
+class StreamPublisher:
+    # Collector side: samples go into a bounded queue and a background thread
+    # posts whatever has queued up as one wire batch, so a slow or unreachable
+    # hub never delays sampling; when the queue is full the oldest samples go.
+    def __init__(self, url, token=None, max_queue=100, timeout=2.0):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.token = token
+        self.timeout = timeout
+        self.queue = deque(maxlen=max_queue)
+        self.ready = threading.Condition()
+        self.running = False
+        self.thread = None
+        self.connection = None
+        self.dropped = 0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name='stream-publisher', daemon=True)
+        self.thread.start()
+
+    def publish(self, row):
+        with self.ready:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(row)
+            self.ready.notify()
+
+    def send(self, rows):
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        headers = {'Content-Type': WIRE_TYPE}
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        self.connection.request('POST', '/publish', encode_batch(rows), headers)
+        response = self.connection.getresponse()
+        body = response.read()
+        if response.status != 200:
+            print(f"Stream hub rejected {len(rows)} samples: {response.status} {body[:200]!r}")
+
+    def run(self):
+        backoff = 1.0
+        while self.running:
+            with self.ready:
+                while self.running and not self.queue:
+                    self.ready.wait()
+                rows = list(self.queue)
+                self.queue.clear()
+            if not rows:
+                continue
+            try:
+                self.send(rows)
+                backoff = 1.0
+            except (OSError, http.client.HTTPException) as e:
+                print(f"Stream hub unreachable, dropped {len(rows)} samples: {e}")
+                if self.connection:
+                    self.connection.close()
+                self.connection = None
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            except Exception as e:
+                # a batch that cannot be encoded is lost, but the thread keeps publishing
+                print(f"Stream publisher error, dropped {len(rows)} samples: {e!r}")
+
+    def stop(self):
+        with self.ready:
+            self.running = False
+            self.ready.notify()
+        if self.thread:
+            self.thread.join(timeout=self.timeout + 1)
+        if self.connection:
+            self.connection.close()
+
+
+class Subscriber:
+    # Per-client backpressure: a client that falls behind loses its oldest
+    # events (dashboards only need the newest values), and one that has dropped
+    # more than max_dropped since it last caught up is disconnected.
+    def __init__(self, host, max_queue, max_dropped):
+        self.host = host
+        self.queue = deque()
+        self.max_queue = max_queue
+        self.max_dropped = max_dropped
+        self.dropped = 0
+        self.total_dropped = 0
+        self.ready = threading.Condition()
+        self.closed = False
+
+    def offer(self, event):
+        with self.ready:
+            if len(self.queue) >= self.max_queue:
+                self.queue.popleft()
+                self.dropped += 1
+                self.total_dropped += 1
+                if self.dropped > self.max_dropped:
+                    self.closed = True
+            self.queue.append(event)
+            self.ready.notify()
+
+    def take(self, timeout):
+        with self.ready:
+            if not self.queue and not self.closed:
+                self.ready.wait(timeout)
+            events = list(self.queue)
+            self.queue.clear()
+            if events:
+                self.dropped = 0
+            return events
+
+
+class StreamHub:
+    def __init__(self, max_queue=50, max_dropped=500):
+        self.max_queue = max_queue
+        self.max_dropped = max_dropped
+        self.subscribers = set()
+        self.latest = {}
+        self.lock = threading.Lock()
+        self.stats = {'published': 0, 'delivered': 0, 'dropped': 0}
+
+    def subscribe(self, host=None):
+        subscriber = Subscriber(host, self.max_queue, self.max_dropped)
+        with self.lock:
+            self.subscribers.add(subscriber)
+            latest = [self.latest[host]] if host in self.latest else list(self.latest.values()) if host is None else []
+        for event in latest:
+            subscriber.offer(event)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+            self.stats['dropped'] += subscriber.total_dropped
+
+    def publish(self, rows):
+        for row in rows:
+            sample = dict(zip(COLUMNS, row))
+            host = sample.get('hostname') or 'unknown'
+            # serialized once, then the same bytes go to every subscriber
+            event = f"event: sample\ndata: {json.dumps(sample)}\n\n".encode()
+            with self.lock:
+                self.latest[host] = event
+                targets = [s for s in self.subscribers if s.host in (None, host)]
+                self.stats['published'] += 1
+            for subscriber in targets:
+                subscriber.offer(event)
+
+
+def make_handler(hub, token=None, keepalive=15.0):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def send_body(self, status, body, content_type='application/json'):
+            data = body if isinstance(body, bytes) else json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length)
+            if self.path != '/publish':
+                return self.send_body(404, {'error': 'not found'})
+            if token and self.headers.get('Authorization') != f"Bearer {token}":
+                return self.send_body(401, {'error': 'bad token'})
+            try:
+                rows = decode_batch(body)
+            except (ValueError, IndexError, UnicodeDecodeError) as e:
+                return self.send_body(400, {'error': str(e)})
+            hub.publish(rows)
+            self.send_body(200, {'published': len(rows)})
+
+        def do_GET(self):
+            if self.path == '/stats':
+                with hub.lock:
+                    stats = dict(hub.stats, subscribers=len(hub.subscribers), hosts=len(hub.latest))
+                return self.send_body(200, stats)
+            match = LATEST_PATH.match(self.path)
+            if match:
+                event = hub.latest.get(match.group(1))
+                if event is None:
+                    return self.send_body(404, {'error': 'no samples yet'})
+                return self.send_body(200, event.split(b'data: ', 1)[1].strip())
+            match = STREAM_PATH.match(self.path)
+            if not match:
+                return self.send_body(404, {'error': 'not found'})
+            self.stream(match.group(1))
+
+        def stream(self, host):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.close_connection = True
+            subscriber = hub.subscribe(host)
+            try:
+                while not subscriber.closed:
+                    events = subscriber.take(keepalive)
+                    self.wfile.write(b"".join(events) if events else b": keepalive\n\n")
+                    self.wfile.flush()
+                    with hub.lock:
+                        hub.stats['delivered'] += len(events)
+                if subscriber.closed:
+                    self.wfile.write(b"event: overflow\ndata: {}\n\n")
+            except OSError:
+                pass
+            finally:
+                hub.unsubscribe(subscriber)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    from dismalOrinGather import read_config
+    stream_config = read_config('stream')
+    parser = argparse.ArgumentParser(description='Push each collector sample to dashboard subscribers over SSE')
+    parser.add_argument('--bind', default=stream_config.get('bind', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(stream_config.get('port', 3004)))
+    parser.add_argument('--client-queue', type=int, default=int(stream_config.get('client_queue', 50)))
+    parser.add_argument('--max-dropped', type=int, default=int(stream_config.get('max_dropped', 500)))
+    args = parser.parse_args()
+
+    hub = StreamHub(args.client_queue, args.max_dropped)
+    server = ThreadingHTTPServer((args.bind, args.port), make_handler(hub, stream_config.get('token') or None))
+    server.daemon_threads = True
+    print(f"Streaming on {args.bind}:{args.port}: POST /publish, GET /stream[/<host>], /latest/<host>, /stats")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+import os
+import re
+import glob
+from datetime import timedelta
+
+# Reads the same values jtop reports straight from sysfs/procfs. Every file is
+# opened once and re-read with os.pread, so a sample costs a handful of
+# syscalls instead of a round trip through the jtop service.
+
+GPU_DEVFREQ_NAMES = ('ga10b', 'gv11b', 'gp10b', 'gpu')
+EMC_DEVFREQ_NAMES = ('emc', 'mc')
+# jtop's engine keys and their clocks under debugfs (only readable as root)
+ENGINE_CLOCKS = {'APE': 'ape', 'NVDEC': 'nvdec', 'NVJPG': 'nvjpg', 'NVJPG1': 'nvjpg1', 'OFA': 'ofa', 'SE': 'se',
+                 'VIC': 'vic'}
+NVPMODEL_NAME = re.compile(r'<\s*POWER_MODEL\s+ID\s*=\s*(\d+)\s+NAME\s*=\s*([^\s>]+)', re.IGNORECASE)
+NVPMODEL_STATUS = re.compile(r'pmode:(\d+)')
+
+
+def read_text(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+class SysfsSampler:
+    def __init__(self, root='/'):
+        self.root = root
+        self.fds = []
+        self.thermal = []
+        self.rails = []
+        self.fan = None
+        self.gpu = None
+        self.emc = None
+        self.engines = {}
+        self.nvp_status = None
+        self.nvp_names = {}
+        self.prev_cpu = {}
+        self.running = True
+        self.proc_stat = self.open_file('proc/stat')
+        self.proc_meminfo = self.open_file('proc/meminfo')
+        self.proc_uptime = self.open_file('proc/uptime')
+        self.discover()
+
+    def path(self, relative):
+        return os.path.join(self.root, relative)
+
+    def open_file(self, relative):
+        try:
+            fd = os.open(self.path(relative), os.O_RDONLY)
+        except OSError:
+            return None
+        self.fds.append(fd)
+        return fd
+
+    def discover(self):
+        for zone in sorted(glob.glob(self.path('sys/class/thermal/thermal_zone*'))):
+            zone_type = read_text(os.path.join(zone, 'type'))
+            fd = self.open_file(os.path.join(zone, 'temp'))
+            if not zone_type or fd is None:
+                continue
+            name = zone_type.replace('-thermal', '')
+            self.thermal.append((f"Temp {name if name == 'tj' else name.upper()}", fd))
+
+        for hwmon in sorted(glob.glob(self.path('sys/class/hwmon/hwmon*'))):
+            name = read_text(os.path.join(hwmon, 'name'))
+            if name == 'ina3221':
+                for label_path in sorted(glob.glob(os.path.join(hwmon, 'in*_label'))):
+                    channel = os.path.basename(label_path)[2:-len('_label')]
+                    label = read_text(label_path)
+                    volt = self.open_file(os.path.join(hwmon, f'in{channel}_input'))
+                    curr = self.open_file(os.path.join(hwmon, f'curr{channel}_input'))
+                    if label and 'sum' not in label.lower() and volt is not None and curr is not None:
+                        self.rails.append((f'Power {label}', volt, curr))
+            elif name == 'pwmfan' and self.fan is None:
+                self.fan = self.open_file(os.path.join(hwmon, 'pwm1'))
+
+        for devfreq in sorted(glob.glob(self.path('sys/class/devfreq/*'))):
+            name = os.path.basename(devfreq).split('.')[-1].lower()
+            load_path = os.path.join(devfreq, 'device', 'load')
+            if not os.path.exists(load_path):
+                continue
+            if self.gpu is None and name in GPU_DEVFREQ_NAMES:
+                self.gpu = self.open_file(load_path)
+            elif self.emc is None and name in EMC_DEVFREQ_NAMES:
+                self.emc = self.open_file(load_path)
+
+        for key, clock in ENGINE_CLOCKS.items():
+            clock_dir = self.path(os.path.join('sys/kernel/debug/clk', clock))
+            enabled = self.open_file(os.path.join(clock_dir, 'clk_enable_count'))
+            rate = self.open_file(os.path.join(clock_dir, 'clk_rate'))
+            if enabled is not None and rate is not None:
+                self.engines[key] = (enabled, rate)
+
+        # nvpmodel keeps the active mode id in its status file; the names come from the config
+        for mode_id, name in NVPMODEL_NAME.findall(read_text(self.path('etc/nvpmodel.conf')) or ''):
+            self.nvp_names[int(mode_id)] = name
+        self.nvp_status = self.open_file('var/lib/nvpmodel/status')
+
+    def read_fd(self, fd):
+        return os.pread(fd, 65536, 0).decode()
+
+    def read_int(self, fd, default=0):
+        if fd is None:
+            return default
+        try:
+            return int(self.read_fd(fd).strip())
+        except (OSError, ValueError):
+            return default
+
+    def read_cpu(self, stats):
+        if self.proc_stat is None:
+            return
+        for line in self.read_fd(self.proc_stat).split('\n'):
+            if not line.startswith('cpu') or line.startswith('cpu '):
+                continue
+            fields = line.split()
+            core = int(fields[0][3:])
+            values = [int(v) for v in fields[1:]]
+            idle = values[3] + (values[4] if len(values) > 4 else 0)
+            total = sum(values[:8])
+            prev = self.prev_cpu.get(core)
+            self.prev_cpu[core] = (idle, total)
+            if prev is None or total == prev[1]:
+                stats[f'CPU{core + 1}'] = 0
+                continue
+            busy = (total - prev[1]) - (idle - prev[0])
+            stats[f'CPU{core + 1}'] = int(round(100 * busy / (total - prev[1])))
+
+    def read_memory(self, stats):
+        if self.proc_meminfo is None:
+            return
+        meminfo = {}
+        for line in self.read_fd(self.proc_meminfo).split('\n'):
+            parts = line.split()
+            if len(parts) >= 2:
+                meminfo[parts[0].rstrip(':')] = int(parts[1])
+        if meminfo.get('MemTotal'):
+            available = meminfo.get('MemAvailable', meminfo.get('MemFree', 0))
+            stats['RAM'] = (meminfo['MemTotal'] - available) / meminfo['MemTotal']
+        if meminfo.get('SwapTotal'):
+            stats['SWAP'] = (meminfo['SwapTotal'] - meminfo.get('SwapFree', 0)) / meminfo['SwapTotal']
+
+    def read_engines(self, stats):
+        # same shape as jtop: the clock in kHz while the engine is on, otherwise 'OFF'
+        for key, (enabled_fd, rate_fd) in self.engines.items():
+            stats[key] = str(self.read_int(rate_fd) // 1000) if self.read_int(enabled_fd) > 0 else 'OFF'
+
+    def read_nvp_model(self):
+        if self.nvp_status is None:
+            return None
+        try:
+            match = NVPMODEL_STATUS.search(self.read_fd(self.nvp_status))
+        except OSError:
+            return None
+        return self.nvp_names.get(int(match.group(1))) if match else None
+
+    def read_power(self, stats):
+        total = 0
+        for key, volt_fd, curr_fd in self.rails:
+            power = self.read_int(volt_fd) * self.read_int(curr_fd) // 1000
+            stats[key] = power
+            total += power
+        if self.rails:
+            stats['Power TOT'] = stats.get('Power VDD_IN', total)
+        return stats
+
+    def ok(self):
+        return self.running
+
+    @property
+    def stats(self):
+        # keys that cannot be read here are None (NULL in the tables), not the
+        # collector defaults, so a missing reading never looks like 'OFF' or 0%.
+        # jetson_clocks has no cheap sysfs equivalent and is always None.
+        stats = dict.fromkeys(ENGINE_CLOCKS, None)
+        stats.update({'EMC': None, 'jetson_clocks': None, 'nvp model': self.read_nvp_model()})
+        if self.proc_uptime is not None:
+            stats['uptime'] = timedelta(seconds=float(self.read_fd(self.proc_uptime).split()[0]))
+        self.read_cpu(stats)
+        self.read_memory(stats)
+        if self.gpu is not None:
+            stats['GPU'] = self.read_int(self.gpu) // 10
+        if self.emc is not None:
+            stats['EMC'] = self.read_int(self.emc) // 10
+        self.read_engines(stats)
+        if self.fan is not None:
+            stats['Fan pwmfan0'] = self.read_int(self.fan) * 100.0 / 255
+        for key, fd in self.thermal:
+            stats[key] = self.read_int(fd, -256000) / 1000.0
+        self.read_power(stats)
+        return stats
+
+    def close(self):
+        self.running = False
+        for fd in self.fds:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self.fds = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
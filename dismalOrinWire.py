@@ -0,0 +1,328 @@
+import json
+import math
+import struct
+import zlib
+import argparse
+from datetime import datetime, timezone
+from dismalOrinMetrics import METRICS, format_uptime
+
+# Batch layout (all integers are LEB128 varints unless noted):
+#   b'OW' | version (1 byte) | schema id (uint32 LE) | sample count
+#   string table: count, then (length, utf-8 bytes) for every distinct string
+#   time: first epoch ms (zigzag), then delta-of-delta ms (zigzag) per sample
+#   one block per remaining column, in schema order:
+#     null marker (0 none null, 1 bitmap follows, 2 all null) [+ bitmap]; in numeric
+#     columns anything that is not a finite number ('OFF', NaN) counts as null
+#     INT/BIGINT     zigzag delta from the previous present value
+#     FLOAT/DOUBLE   float32/float64 XOR with the previous value: one byte of
+#                    trailing zero bytes dropped, then the remaining bits as a varint
+#                    (FLOAT columns only ever hold float32, so nothing is lost)
+#     text           0 same as previous, otherwise 1 + string table index
+MAGIC = b'OW'
+WIRE_VERSION = 1
+SCHEMA_ID = struct.Struct('<I')
+FLOAT_BITS = {'float': struct.Struct('<f'), 'double': struct.Struct('<d')}
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+SCHEMAS = {}
+
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def unzigzag(value):
+    return value // 2 if not value & 1 else -(value + 1) // 2
+
+
+def column_kind(sql_type):
+    sql_type = sql_type.upper()
+    if sql_type.startswith(('INT', 'BIGINT')):
+        return 'int'
+    if sql_type.startswith('FLOAT'):
+        return 'float'
+    if sql_type.startswith('DOUBLE'):
+        return 'double'
+    if sql_type.startswith('DATETIME'):
+        return 'time'
+    return 'text'
+
+
+def register_schema(metrics=METRICS):
+    # the id is a hash of the column layout, so a collector and a server built
+    # from different metric lists can never silently misread each other
+    signature = ",".join(f"{m.column}:{m.sql_type}" for m in metrics)
+    schema_id = zlib.crc32(signature.encode())
+    SCHEMAS[schema_id] = list(metrics)
+    return schema_id
+
+
+DEFAULT_SCHEMA_ID = register_schema()
+
+
+def to_epoch_ms(value):
+    if isinstance(value, str):
+        value = datetime.strptime(value, TIME_FORMAT)
+    return int(round(value.replace(tzinfo=timezone.utc).timestamp() * 1000))
+
+
+def from_epoch_ms(ms):
+    when = datetime.fromtimestamp(ms / 1000.0, timezone.utc).replace(tzinfo=None)
+    return when.strftime(TIME_FORMAT) if ms % 1000 == 0 else when.isoformat(sep=' ')
+
+
+def as_text(value):
+    if isinstance(value, str):
+        return value
+    return format_uptime(value) if hasattr(value, 'days') else str(value)
+
+
+def as_number(value):
+    # anything that is not a finite number (None, 'OFF', NaN) goes on the wire as null
+    if isinstance(value, bool):
+        return float(value)
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def write_nulls(out, values):
+    missing = [v is None for v in values]
+    if not any(missing):
+        out.append(0)
+    elif all(missing):
+        out.append(2)
+    else:
+        out.append(1)
+        bitmap = bytearray((len(values) + 7) // 8)
+        for i, m in enumerate(missing):
+            if m:
+                bitmap[i >> 3] |= 1 << (i & 7)
+        out += bitmap
+    return [v for v in values if v is not None]
+
+
+def read_nulls(data, pos, count):
+    marker = data[pos]
+    pos += 1
+    if marker == 0:
+        return [False] * count, pos
+    if marker == 2:
+        return [True] * count, pos
+    size = (count + 7) // 8
+    bitmap = data[pos:pos + size]
+    return [bool(bitmap[i >> 3] & (1 << (i & 7))) for i in range(count)], pos + size
+
+
+def encode_batch(rows, schema_id=DEFAULT_SCHEMA_ID):
+    # rows are tuples in schema order, e.g. from make_row_builder() or a SELECT
+    metrics = SCHEMAS[schema_id]
+    columns = list(zip(*rows)) if rows else [[] for _ in metrics]
+    out = bytearray(MAGIC)
+    out.append(WIRE_VERSION)
+    out += SCHEMA_ID.pack(schema_id)
+    write_varint(out, len(rows))
+
+    strings = {}
+    for metric, values in zip(metrics, columns):
+        if column_kind(metric.sql_type) == 'text':
+            for v in values:
+                if v is not None:
+                    strings.setdefault(as_text(v), len(strings))
+    write_varint(out, len(strings))
+    for text in strings:
+        encoded = text.encode()
+        write_varint(out, len(encoded))
+        out += encoded
+
+    for metric, values in zip(metrics, columns):
+        kind = column_kind(metric.sql_type)
+        if kind == 'int' or kind in FLOAT_BITS:
+            values = [as_number(v) for v in values]
+        present = write_nulls(out, values)
+        if kind == 'time':
+            previous, previous_delta = 0, 0
+            for i, v in enumerate(present):
+                ms = to_epoch_ms(v)
+                delta = ms - previous
+                write_varint(out, zigzag(ms if i == 0 else delta - previous_delta))
+                previous_delta = delta if i else 0
+                previous = ms
+        elif kind == 'int':
+            previous = 0
+            for v in present:
+                v = int(round(v))
+                write_varint(out, zigzag(v - previous))
+                previous = v
+        elif kind in FLOAT_BITS:
+            packer = FLOAT_BITS[kind]
+            previous = 0
+            for v in present:
+                bits = int.from_bytes(packer.pack(v), 'little')
+                xor = bits ^ previous
+                trailing = 0
+                while trailing < packer.size and not (xor >> (8 * trailing)) & 0xff:
+                    trailing += 1
+                out.append(trailing)
+                if trailing < packer.size:
+                    write_varint(out, xor >> (8 * trailing))
+                previous = bits
+        else:
+            previous = None
+            for v in present:
+                text = as_text(v)
+                write_varint(out, 0 if text == previous else 1 + strings[text])
+                previous = text
+    return bytes(out)
+
+
+def decode_batch(data):
+    if data[:2] != MAGIC:
+        raise ValueError("Not an Orin wire batch")
+    if data[2] != WIRE_VERSION:
+        raise ValueError(f"Unsupported wire version {data[2]}")
+    schema_id = SCHEMA_ID.unpack_from(data, 3)[0]
+    metrics = SCHEMAS.get(schema_id)
+    if metrics is None:
+        raise ValueError(f"Unknown schema id {schema_id:#010x}")
+    pos = 3 + SCHEMA_ID.size
+    count, pos = read_varint(data, pos)
+
+    n, pos = read_varint(data, pos)
+    strings = []
+    for _ in range(n):
+        length, pos = read_varint(data, pos)
+        strings.append(bytes(data[pos:pos + length]).decode())
+        pos += length
+
+    columns = []
+    for metric in metrics:
+        kind = column_kind(metric.sql_type)
+        missing, pos = read_nulls(data, pos, count)
+        present = []
+        previous = 0
+        if kind == 'time':
+            previous_delta = 0
+            for i in range(missing.count(False)):
+                value, pos = read_varint(data, pos)
+                if i == 0:
+                    previous = unzigzag(value)
+                else:
+                    previous_delta += unzigzag(value)
+                    previous += previous_delta
+                present.append(from_epoch_ms(previous))
+        elif kind == 'int':
+            for _ in range(missing.count(False)):
+                value, pos = read_varint(data, pos)
+                previous += unzigzag(value)
+                present.append(previous)
+        elif kind in FLOAT_BITS:
+            packer = FLOAT_BITS[kind]
+            for _ in range(missing.count(False)):
+                trailing = data[pos]
+                pos += 1
+                xor = 0
+                if trailing < packer.size:
+                    xor, pos = read_varint(data, pos)
+                previous ^= xor << (8 * trailing)
+                present.append(packer.unpack(previous.to_bytes(packer.size, 'little'))[0])
+        else:
+            previous = None
+            for _ in range(missing.count(False)):
+                value, pos = read_varint(data, pos)
+                if value:
+                    previous = strings[value - 1]
+                present.append(previous)
+        values = iter(present)
+        columns.append([None if m else next(values) for m in missing])
+    return [tuple(row) for row in zip(*columns)] if count else []
+
+
+def json_batch(rows, metrics=METRICS):
+    # what the same batch costs as the dicts the collector builds today
+    return json.dumps([{m.key: (v if isinstance(v, (int, float, type(None))) else str(v))
+                        for m, v in zip(metrics, row)} for row in rows]).encode()
+
+
+def same_value(kind, original, decoded):
+    if kind == 'int' or kind in FLOAT_BITS:
+        original = as_number(original)
+    if original is None or decoded is None:
+        return original is decoded
+    if kind == 'int':
+        return int(round(original)) == decoded
+    if kind in FLOAT_BITS:
+        packer = FLOAT_BITS[kind]
+        return packer.unpack(packer.pack(original))[0] == decoded
+    if kind == 'time':
+        return to_epoch_ms(original) == to_epoch_ms(decoded)
+    return as_text(original) == decoded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Round-trip a sample batch through the wire format and compare it with JSON')
+    parser.add_argument('--host', help='encode the newest rows of <host>_storage (default: synthetic samples)')
+    parser.add_argument('--samples', type=int, default=720, help='samples per batch')
+    args = parser.parse_args()
+
+    if args.host:
+        import mysql.connector
+        from dismalOrinGather import read_db_config
+        connection = mysql.connector.connect(**read_db_config())
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT {', '.join(f'`{m.column}`' for m in METRICS)} FROM `{args.host}_storage` "
+                       f"ORDER BY id DESC LIMIT %s", (args.samples,))
+        rows = cursor.fetchall()[::-1]
+        connection.close()
+    else:
+        import random
+        from datetime import timedelta
+        from dismalOrinMetrics import make_row_builder, synthetic_stats, synthetic_device
+        rng = random.Random(1)
+        build_row = make_row_builder()
+        device = synthetic_device('sim000')
+        start = datetime(2024, 1, 1)
+        rows = [build_row(synthetic_stats(rng), device,
+                          {'time': (start + timedelta(seconds=5 * i)).strftime(TIME_FORMAT),
+                           'disk_available_gb': 42.5, 'sample_interval': 5.0, 'boot_id': device['serial_number'],
+                           'seq': i + 1})
+                for i in range(args.samples)]
+
+    encoded = encode_batch(rows)
+    decoded = decode_batch(encoded)
+    kinds = [column_kind(m.sql_type) for m in METRICS]
+    mismatches = [(m.column, i) for i, (a, b) in enumerate(zip(rows, decoded))
+                  for m, kind, x, y in zip(METRICS, kinds, a, b) if not same_value(kind, x, y)]
+    as_json = json_batch(rows)
+    print(f"{len(rows)} samples: wire {len(encoded)} bytes ({len(encoded) / max(len(rows), 1):.1f}/sample), "
+          f"JSON {len(as_json)} bytes ({len(as_json) / max(len(rows), 1):.1f}/sample), "
+          f"{len(as_json) / max(len(encoded), 1):.1f}x smaller")
+    if mismatches or len(decoded) != len(rows):
+        print(f"Round trip FAILED: {len(mismatches)} values differ, first {mismatches[:5]}")
+        return 1
+    print("Round trip OK")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
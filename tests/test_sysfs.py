@@ -0,0 +1,111 @@
+import os
+from datetime import timedelta
+import pytest
+from dismalOrinSysfs import SysfsSampler, ENGINE_CLOCKS
+
+STAT = """cpu  {all}
+cpu0 {cpu0} 0 0 0 0
+cpu1 {cpu1} 0 0 0 0
+intr 123
+"""
+
+
+def write(root, relative, text):
+    path = os.path.join(root, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def cpu_line(user, idle, iowait=0):
+    return f"{user} 0 0 {idle} {iowait}"
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = str(tmp_path)
+    write(root, 'proc/stat', STAT.format(all='0 0 0 0', cpu0=cpu_line(100, 900), cpu1=cpu_line(0, 1000)))
+    write(root, 'proc/meminfo', "MemTotal:  8000000 kB\nMemFree: 1000000 kB\nMemAvailable: 2000000 kB\n"
+                                "SwapTotal: 4000000 kB\nSwapFree: 3000000 kB\n")
+    write(root, 'proc/uptime', "93784.50 1000.00\n")
+    write(root, 'sys/class/thermal/thermal_zone0/type', "cpu-thermal\n")
+    write(root, 'sys/class/thermal/thermal_zone0/temp', "45500\n")
+    write(root, 'sys/class/thermal/thermal_zone1/type', "tj-thermal\n")
+    write(root, 'sys/class/thermal/thermal_zone1/temp', "51250\n")
+    hwmon = 'sys/class/hwmon/hwmon0'
+    write(root, f'{hwmon}/name', "ina3221\n")
+    for channel, label, volt, curr in ((1, 'VDD_CPU_GPU_CV', 5000, 400), (2, 'VDD_SOC', 5000, 300),
+                                       (7, 'sum of shunt voltages', 5000, 700)):
+        write(root, f'{hwmon}/in{channel}_label', f"{label}\n")
+        write(root, f'{hwmon}/in{channel}_input', f"{volt}\n")
+        write(root, f'{hwmon}/curr{channel}_input', f"{curr}\n")
+    write(root, 'sys/class/hwmon/hwmon1/name', "pwmfan\n")
+    write(root, 'sys/class/hwmon/hwmon1/pwm1', "51\n")
+    write(root, 'sys/class/devfreq/17000000.ga10b/device/load', "734\n")
+    return root
+
+
+def test_first_sample(tree):
+    with SysfsSampler(tree) as sampler:
+        assert sampler.ok()
+        stats = sampler.stats
+    assert stats['uptime'] == timedelta(seconds=93784.5)
+    assert stats['CPU1'] == 0 and stats['CPU2'] == 0  # no previous reading yet
+    assert stats['RAM'] == pytest.approx(0.75)
+    assert stats['SWAP'] == pytest.approx(0.25)
+    assert stats['GPU'] == 73
+    assert stats['Fan pwmfan0'] == pytest.approx(20.0)
+    assert stats['Temp CPU'] == 45.5
+    assert stats['Temp tj'] == 51.25
+    assert stats['Power VDD_CPU_GPU_CV'] == 2000
+    assert stats['Power VDD_SOC'] == 1500
+    assert 'Power sum of shunt voltages' not in stats
+    assert stats['Power TOT'] == 3500
+    assert not sampler.ok()
+
+
+def test_cpu_load_between_samples(tree):
+    with SysfsSampler(tree) as sampler:
+        sampler.stats
+        write(tree, 'proc/stat', STAT.format(all='0 0 0 0', cpu0=cpu_line(175, 925), cpu1=cpu_line(10, 1080, 10)))
+        stats = sampler.stats
+    assert stats['CPU1'] == 75
+    assert stats['CPU2'] == 10
+
+
+def test_power_total_prefers_vdd_in(tree):
+    hwmon = os.path.join(tree, 'sys/class/hwmon/hwmon0')
+    write(hwmon, 'in3_label', "VDD_IN\n")
+    write(hwmon, 'in3_input', "5000\n")
+    write(hwmon, 'curr3_input', "1000\n")
+    with SysfsSampler(tree) as sampler:
+        assert sampler.stats['Power TOT'] == 5000
+
+
+def test_unreadable_values_are_none(tree):
+    with SysfsSampler(tree) as sampler:
+        stats = sampler.stats
+    assert stats['EMC'] is None  # Orin has no EMC devfreq node
+    assert stats['jetson_clocks'] is None
+    assert stats['nvp model'] is None
+    assert all(stats[key] is None for key in ENGINE_CLOCKS)
+
+
+def test_nvp_model_engines_and_emc(tree):
+    write(tree, 'etc/nvpmodel.conf', "< POWER_MODEL ID=0 NAME=MAXN >\nCPU_ONLINE CORE_0 1\n"
+                                     "< POWER_MODEL ID=1 NAME=15W >\nCPU_ONLINE CORE_0 1\n")
+    write(tree, 'var/lib/nvpmodel/status', "pmode:0001 fmode:quiet\n")
+    write(tree, 'sys/kernel/debug/clk/nvdec/clk_enable_count', "1\n")
+    write(tree, 'sys/kernel/debug/clk/nvdec/clk_rate', "601600000\n")
+    write(tree, 'sys/kernel/debug/clk/vic/clk_enable_count', "0\n")
+    write(tree, 'sys/kernel/debug/clk/vic/clk_rate', "115200000\n")
+    write(tree, 'sys/class/devfreq/emc/device/load', "120\n")
+    with SysfsSampler(tree) as sampler:
+        stats = sampler.stats
+        write(tree, 'var/lib/nvpmodel/status', "pmode:0000 fmode:quiet\n")
+        assert sampler.stats['nvp model'] == 'MAXN'
+    assert stats['nvp model'] == '15W'
+    assert stats['NVDEC'] == '601600'
+    assert stats['VIC'] == 'OFF'
+    assert stats['OFA'] is None
+    assert stats['EMC'] == 12
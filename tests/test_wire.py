@@ -0,0 +1,133 @@
+import random
+import struct
+from datetime import datetime, timedelta
+import pytest
+from dismalOrinMetrics import METRICS, Metric, format_uptime, make_row_builder, synthetic_stats, synthetic_device
+from dismalOrinWire import (encode_batch, decode_batch, register_schema, read_varint, write_varint, zigzag,
+                            unzigzag)
+
+SMALL = [
+    Metric('time', 'sample', 'time', 'DATETIME', None),
+    Metric('uptime', 'stats', 'uptime', 'VARCHAR(50)', None),
+    Metric('cpu1', 'stats', 'CPU1', 'INT', 0),
+    Metric('ram', 'stats', 'RAM', 'FLOAT', 0),
+    Metric('energy_tot_mj', 'sample', 'energy_tot_mj', 'DOUBLE', None),
+    Metric('nvp_model', 'stats', 'nvp model', 'VARCHAR(50)', None),
+]
+SMALL_ID = register_schema(SMALL)
+
+
+def round_trip(rows, schema_id=SMALL_ID):
+    return decode_batch(encode_batch(rows, schema_id))
+
+
+def times(n, step=5):
+    start = datetime(2024, 1, 1)
+    return [(start + timedelta(seconds=step * i)).strftime('%Y-%m-%d %H:%M:%S') for i in range(n)]
+
+
+def test_empty_batch():
+    assert round_trip([]) == []
+    assert decode_batch(encode_batch([])) == []
+
+
+@pytest.mark.parametrize('value', [0, 1, 127, 128, 300, 2 ** 35, 2 ** 63 - 1])
+def test_varint(value):
+    out = bytearray()
+    write_varint(out, value)
+    assert read_varint(out, 0) == (value, len(out))
+
+
+@pytest.mark.parametrize('value', [0, 1, -1, 63, -64, 2 ** 40, -2 ** 40])
+def test_zigzag(value):
+    assert zigzag(value) >= 0
+    assert unzigzag(zigzag(value)) == value
+
+
+def test_nulls_and_text():
+    rows = [
+        (t, '1 day, 2:03:04', None if i % 3 == 0 else i, None, None if i == 2 else 0.5 * i, None if i % 2 else '15W')
+        for i, t in enumerate(times(10))
+    ]
+    decoded = round_trip(rows)
+    assert [row[2] for row in decoded] == [row[2] for row in rows]
+    assert all(row[3] is None for row in decoded)
+    assert [row[4] for row in decoded] == [row[4] for row in rows]
+    assert [row[5] for row in decoded] == [row[5] for row in rows]
+    assert [row[1] for row in decoded] == ['1 day, 2:03:04'] * 10
+
+
+def test_uptime_timedelta_is_sent_as_text():
+    uptime = timedelta(days=1, hours=2, minutes=3, seconds=4)
+    rows = [(t, uptime, 1, 1.0, 1.0, 'MAXN') for t in times(2)]
+    assert [row[1] for row in round_trip(rows)] == [format_uptime(uptime)] * 2
+
+
+def test_times_keep_irregular_gaps():
+    stamps = times(3) + ['2024-01-01 01:00:00', '2023-12-31 23:59:59']
+    rows = [(t, None, 0, 0.0, 0.0, None) for t in stamps]
+    assert [row[0] for row in round_trip(rows)] == stamps
+
+
+def test_non_numeric_values_become_null():
+    rows = [(t, None, v, f, d, None) for t, v, f, d in zip(
+        times(5), ['OFF', 3, float('nan'), '7', True],
+        ['OFF', float('nan'), 1.5, float('inf'), None],
+        [float('-inf'), 'x', 2.25, float('nan'), 0.0])]
+    decoded = round_trip(rows)
+    assert [row[2] for row in decoded] == [None, 3, None, 7, 1]
+    assert [row[3] for row in decoded] == [None, None, 1.5, None, None]
+    assert [row[4] for row in decoded] == [None, None, 2.25, None, 0.0]
+
+
+@pytest.mark.parametrize('values', [
+    [0.0, 0.0, -0.0, 0.0],
+    [1.0, 1.0, 1.0],
+    [5e-324, 1.7976931348623157e308, -1.7976931348623157e308, 2.2250738585072014e-308],
+    [1e15 + 0.25, 1e15 + 0.5, 123456789.123456789, -3.0],
+])
+def test_double_xor_is_exact(values):
+    rows = [(t, None, 0, 0.0, v, None) for t, v in zip(times(len(values)), values)]
+    decoded = [row[4] for row in round_trip(rows)]
+    assert [struct.pack('<d', v) for v in decoded] == [struct.pack('<d', v) for v in values]
+
+
+@pytest.mark.parametrize('values', [
+    [0.0, -0.0, 0.0],
+    [36.5, 36.5, 36.75, 99.9],
+    [1e-45, 3.4028234663852886e38, -3.4028234663852886e38],
+])
+def test_float_xor_matches_float32(values):
+    rows = [(t, None, 0, v, 0.0, None) for t, v in zip(times(len(values)), values)]
+    decoded = [row[3] for row in round_trip(rows)]
+    expected = [struct.unpack('<f', struct.pack('<f', v))[0] for v in values]
+    assert [struct.pack('<f', v) for v in decoded] == [struct.pack('<f', v) for v in expected]
+
+
+def test_collector_rows_round_trip():
+    rng = random.Random(7)
+    build_row = make_row_builder()
+    device = synthetic_device('sim001')
+    rows = []
+    for i, t in enumerate(times(50)):
+        stats = synthetic_stats(rng)
+        if i == 10:
+            stats['CPU5'] = 'OFF'
+        rows.append(build_row(stats, device, {'time': t, 'disk_available_gb': 12.5, 'sample_interval': 5.0,
+                                              'boot_id': 'b' * 36, 'seq': i + 1, 'energy_tot_mj': 1e9 + i / 3}))
+    decoded = decode_batch(encode_batch(rows))
+    assert len(decoded) == len(rows)
+    columns = [m.column for m in METRICS]
+    cpu5, energy = columns.index('cpu5'), columns.index('energy_tot_mj')
+    assert decoded[10][cpu5] is None
+    assert [row[energy] for row in decoded] == [row[energy] for row in rows]
+    assert [row[columns.index('hostname')] for row in decoded] == ['sim001'] * 50
+
+
+def test_rejects_foreign_batches():
+    with pytest.raises(ValueError):
+        decode_batch(b'XX\x01')
+    data = bytearray(encode_batch([]))
+    data[3] ^= 0xff
+    with pytest.raises(ValueError):
+        decode_batch(bytes(data))